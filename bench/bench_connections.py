@@ -0,0 +1,100 @@
+"""Per-connection memory, heartbeat and status build cost at 500 connections.
+
+Compares the slotted ``Connection`` with the previous pydantic model
+representation (reproduced here as ``ModelConnection``).
+
+    python bench/bench_connections.py [connections]
+"""
+
+import os
+import sys
+import time
+import timeit
+import tracemalloc
+from typing import Optional
+
+from pydantic import BaseModel
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from manager import ConnectionManager  # type: ignore
+from models import Connection, LeitstelleData, VehicleStatus  # type: ignore
+
+
+class ModelConnection(BaseModel):
+    name: str
+    status: str = "2"
+    special: Optional[str] = None
+    kurzstatus: Optional[str] = None
+    last_update: float
+    last_status_update: float
+    last_blitz_update: Optional[float] = None
+    last_sprechwunsch_update: Optional[float] = None
+    is_staffelfuehrer: bool = False
+    is_leitstelle: bool = False
+    talking_to_sf: bool = False
+    talking_to_sf_since: Optional[float] = None
+    radio_channel: Optional[str] = None
+    claimed_by: Optional[str] = None
+    ls_claimed_by: Optional[str] = None
+    last_activity: float
+
+
+def _kwargs(i: int, now: float) -> dict:
+    return dict(name=f"Florian {i}", last_update=now, last_status_update=now, last_activity=now)
+
+
+def bytes_per_connection(cls, n: int) -> float:
+    now = time.time()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    conns = [cls(**_kwargs(i, now)) for i in range(n)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del conns
+    return (after - before) / n
+
+
+def heartbeat_us(cls, n: int) -> float:
+    now = time.time()
+    conns = [cls(**_kwargs(i, now)) for i in range(n)]
+
+    def beat():
+        t = time.time()
+        for c in conns:
+            c.last_update = t
+    return min(timeit.repeat(beat, number=20, repeat=5)) / 20 * 1e6
+
+
+def status_build_ms(n: int, build) -> float:
+    manager = ConnectionManager()
+    now = time.time()
+    ls = LeitstelleData(name="Bench", vehicle_code="CAR", staffelfuehrer_code="SF")
+    for i in range(n):
+        ls.add_connection(Connection(**_kwargs(i, now)))
+    manager.register("ADMIN", ls)
+    original = manager._build_vehicle_status
+    manager._build_vehicle_status = lambda a, l, c, t: build(original, a, l, c, t)
+
+    def full_build():
+        manager._vehicle_cache.clear()
+        manager._payload_cache.clear()
+        manager.status_json("ADMIN")
+    return min(timeit.repeat(full_build, number=5, repeat=5)) / 5 * 1e3
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    print(f"{n} connections per leitstelle")
+    print(f"{'':28}{'model':>12}{'slotted':>12}")
+    print(f"{'bytes per connection':28}{bytes_per_connection(ModelConnection, n):>12.0f}"
+          f"{bytes_per_connection(Connection, n):>12.0f}")
+    print(f"{'heartbeat pass (us)':28}{heartbeat_us(ModelConnection, n):>12.1f}{heartbeat_us(Connection, n):>12.1f}")
+
+    validated = status_build_ms(n, lambda orig, a, l, c, t: VehicleStatus(**dict(orig(a, l, c, t))))
+    constructed = status_build_ms(n, lambda orig, a, l, c, t: orig(a, l, c, t))
+    print(f"{'full status build (ms)':28}{validated:>12.2f}{constructed:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
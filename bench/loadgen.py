@@ -0,0 +1,417 @@
+"""HTTP load generator: N leitstellen with vehicle, SF and LS clients each.
+
+Drives the real endpoints the frontend uses at roughly the rates of a
+training session: clients hold a WebSocket (``/ws/{code}``) that is pinged
+every few seconds, a share of them (``--ws-fraction``) instead use the
+polling fallback of heartbeats plus ``/api/poll`` whenever the revision
+moved. Vehicles cycle through their status flow and send
+Kurzstatus/Sprechwunsch, the Staffelführer claims vehicles and sends
+notices, the Leitstelle chats, starts scenarios and works through their
+checklists.
+
+Without ``--url`` a local server is started (``uvicorn main:app``) so its RSS
+can be sampled; pass ``--pid`` to sample an already running one.
+
+    python bench/loadgen.py --leitstellen 10 --vehicles 30 --duration 60
+    python bench/loadgen.py --url http://localhost:8000 --pid 1234
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Set
+from urllib.parse import urlencode
+
+import httpx
+import websockets
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../src'))
+
+# Status flow of a vehicle on an Einsatz, see api._handle_status_change
+STATUS_CYCLE = ["1", "3", "4", "7", "8", "1", "2"]
+KURZSTATUS = ["Lage unklar", "Nachforderung RTW", "Einsatzstelle erreicht", "Lage unter Kontrolle"]
+# As in the frontend (usePolling.ts)
+PING_INTERVAL = 5.0
+
+
+class Stats:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        # WebSocket frames received per label; they have no request latency
+        self.pushes: Dict[str, int] = defaultdict(int)
+        self.rss: List[int] = []
+
+    def record(self, label: str, seconds: float, ok: bool):
+        self.latencies[label].append(seconds)
+        if not ok:
+            self.errors[label] += 1
+
+    def report(self, elapsed: float):
+        print(f"{'endpoint':<22}{'count':>9}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        total = 0
+        for label in sorted(self.latencies):
+            values = sorted(self.latencies[label])
+            total += len(values)
+            print(f"{label:<22}{len(values):>9}{self.errors[label]:>8}"
+                  + "".join(f"{percentile(values, p) * 1e3:>10.2f}" for p in (50, 95, 99)))
+        everything = sorted(v for values in self.latencies.values() for v in values)
+        print(f"{'all':<22}{total:>9}{sum(self.errors.values()):>8}"
+              + "".join(f"{percentile(everything, p) * 1e3:>10.2f}" for p in (50, 95, 99)))
+        print(f"\n{total / elapsed:.1f} requests/s over {elapsed:.1f}s")
+        for label in sorted(self.pushes):
+            print(f"{label}: {self.pushes[label]} frames, {self.pushes[label] / elapsed:.1f}/s")
+        if self.rss:
+            print(f"server RSS: {self.rss[-1] / 2**20:.1f} MiB at end, {max(self.rss) / 2**20:.1f} MiB peak")
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def rss_bytes(pid: int) -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+class Session:
+    """One leitstelle and its clients."""
+
+    def __init__(self, client: httpx.AsyncClient, stats: Stats, args, index: int):
+        self.client = client
+        self.stats = stats
+        self.args = args
+        self.index = index
+        self.admin_code = ""
+        self.vehicle_code = ""
+        self.sf_code = ""
+        self.vehicles = [f"Florian {index}-{i}" for i in range(args.vehicles)]
+        self.scenarios: List[str] = []
+        # Board as the LS client sees it, kept up to date from its polls
+        self.board: Dict[str, dict] = {}
+        # Set once a client's first poll or WebSocket frame registered it;
+        # acting before that only measures "not found" errors of the harness
+        self.registered: Dict[str, asyncio.Event] = {}
+        # Vehicles the SF holds; notices require a claim
+        self.claimed: Set[str] = set()
+
+    async def request(self, label: str, method: str, url: str, **kwargs) -> Optional[dict]:
+        start = time.perf_counter()
+        try:
+            resp = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.stats.record(label, time.perf_counter() - start, False)
+            return None
+        # The API reports failures as 200 with {"status": "error", ...}
+        data = None
+        if resp.status_code == 200:
+            try:
+                data = resp.json()
+            except ValueError:
+                pass
+        ok = isinstance(data, dict) and data.get("status") != "error"
+        self.stats.record(label, time.perf_counter() - start, ok)
+        return data if ok else None
+
+    async def create(self) -> bool:
+        data = await self.request("create", "POST", "/leitstelle", json={"name": f"Last {self.index}"})
+        if data is None:
+            return False
+        self.admin_code = data["admin_code"]
+        self.vehicle_code = data["vehicle_code"]
+        self.sf_code = data["staffelfuehrer_code"]
+        scenarios = await self.request("scenarios", "GET", f"/api/leitstelle/{self.admin_code}/scenarios")
+        self.scenarios = [s["name"] for s in scenarios["scenarios"]] if scenarios else []
+        return True
+
+    async def pause(self, seconds: float, deadline: float):
+        await asyncio.sleep(max(0.0, min(seconds, deadline - time.monotonic())))
+
+    def client_loop(self, code: str, name: Optional[str], deadline: float, on_update=None):
+        ready = self.registered[name or code] = asyncio.Event()
+        if random.random() < self.args.ws_fraction:
+            return self.ws_loop(code, name, deadline, ready, on_update)
+        return self.poll_loop(code, name, deadline, ready, on_update)
+
+    async def ws_loop(self, code: str, name: Optional[str], deadline: float, ready: asyncio.Event, on_update=None):
+        url = self.args.url.replace("http", "ws", 1) + f"/ws/{code}" + (f"?{urlencode({'name': name})}" if name else "")
+        await self.pause(random.uniform(0, PING_INTERVAL), deadline)
+        start = time.perf_counter()
+        try:
+            ws = await websockets.connect(url)
+        except (OSError, websockets.WebSocketException):
+            self.stats.record("ws_connect", time.perf_counter() - start, False)
+            return
+        self.stats.record("ws_connect", time.perf_counter() - start, True)
+
+        async def ping():
+            while True:
+                await asyncio.sleep(PING_INTERVAL)
+                await ws.send("ping")
+
+        async def receive():
+            async for frame in ws:
+                self.stats.pushes["ws_push"] += 1
+                ready.set()
+                if on_update:
+                    on_update(json.loads(frame))
+
+        async with ws:
+            tasks = [asyncio.create_task(ping()), asyncio.create_task(receive())]
+            done, _ = await asyncio.wait(tasks, timeout=max(0.0, deadline - time.monotonic()),
+                                         return_when=asyncio.FIRST_COMPLETED)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            # Closed by the server before the end of the run
+            if done:
+                self.stats.errors["ws_connect"] += 1
+
+    async def poll_loop(self, code: str, name: Optional[str], deadline: float, ready: asyncio.Event,
+                        on_update=None):
+        """The frontend's fallback: heartbeat, and poll only when the revision moved."""
+        since: Optional[int] = None
+        after: Optional[int] = None
+        await self.pause(random.uniform(0, self.args.poll_interval), deadline)
+        while time.monotonic() < deadline:
+            params = {"name": name} if name else {}
+            if since is not None:
+                beat = await self.request("heartbeat", "POST", f"/api/heartbeat/{code}", params=params)
+                if beat and beat["revision"] == since:
+                    await self.pause(self.args.poll_interval, deadline)
+                    continue
+                params.update((k, v) for k, v in (("since", since), ("after", after)) if v is not None)
+            data = await self.request("poll", "GET", f"/api/poll/{code}", params=params)
+            if data:
+                ready.set()
+                since = data["revision"]
+                seqs = [m["seq"] for m in data.get("messages", [])]
+                if seqs:
+                    after = max(seqs)
+                elif after is None and name:
+                    after = 0
+                if on_update:
+                    on_update(data)
+            await self.pause(self.args.poll_interval, deadline)
+
+    async def every(self, interval: float, deadline: float, action, ready: asyncio.Event):
+        try:
+            await asyncio.wait_for(ready.wait(), max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            return
+        await self.pause(random.uniform(0, interval), deadline)
+        while time.monotonic() < deadline:
+            await action()
+            await self.pause(random.expovariate(1 / interval), deadline)
+
+    # --- Vehicles -------------------------------------------------------
+
+    def vehicle_actions(self, name: str):
+        step = 0
+
+        async def act():
+            nonlocal step
+            roll = random.random()
+            if roll < 0.6:
+                value = STATUS_CYCLE[step % len(STATUS_CYCLE)]
+                step += 1
+                body = {"name": name, "action": "status", "value": value}
+            elif roll < 0.8:
+                body = {"name": name, "action": "kurzstatus", "value": random.choice(KURZSTATUS)}
+            elif roll < 0.9:
+                body = {"name": name, "action": "status", "value": "5"}
+            else:
+                body = {"name": name, "action": "toggle_sf"}
+            await self.request("vehicle_action", "POST", f"/api/vehicle/{self.vehicle_code}/action", json=body)
+        return act
+
+    # --- Staffelführer --------------------------------------------------
+
+    async def sf_action(self):
+        vehicles = [v for v in self.vehicles if self.registered[v].is_set()]
+        if not vehicles:
+            return
+        target = random.choice(vehicles)
+        roll = random.random()
+        if roll < 0.3 or roll < 0.7 and target not in self.claimed:
+            if await self.request("sf_claim", "POST", f"/api/staffelfuehrer/{self.sf_code}/claim",
+                                  json={"target_name": target, "sf_name": "SF"}):
+                self.claimed.add(target)
+        elif roll < 0.5:
+            await self.request("sf_unclaim", "POST", f"/api/staffelfuehrer/{self.sf_code}/unclaim",
+                               json={"target_name": target})
+            self.claimed.discard(target)
+        elif roll < 0.7:
+            await self.request("sf_notice", "POST", f"/api/staffelfuehrer/{self.sf_code}/notice",
+                               json={"target_name": target, "text": "Lagemeldung", "sf_name": "SF"})
+        else:
+            await self.request("message", "POST", f"/api/leitstelle/{self.sf_code}/message",
+                               json={"target_name": target, "message": "Kommen"})
+
+    # --- Leitstelle -----------------------------------------------------
+
+    def on_ls_update(self, data: dict):
+        if data["type"] == "status_update":
+            self.board = {c["name"]: c for c in data["connections"]}
+        elif data["type"] == "status_delta":
+            self.board = {n: self.board[n] for n in data["names"] if n in self.board}
+            self.board.update((c["name"], c) for c in data["connections"])
+
+    async def ls_action(self):
+        admin = self.admin_code
+        vehicles = [v for v in self.board.values() if not v["is_staffelfuehrer"]]
+        if not vehicles:
+            return
+        target = random.choice(vehicles)
+        roll = random.random()
+        if roll < 0.25:
+            await self.request("message", "POST", f"/api/leitstelle/{admin}/message",
+                               json={"target_name": target["name"], "message": "Verstanden"})
+        elif roll < 0.3:
+            await self.request("message", "POST", f"/api/leitstelle/{admin}/message", json={"message": "An alle"})
+        elif roll < 0.4:
+            await self.request("chat_history", "GET", f"/api/leitstelle/{admin}/chat_history",
+                               params={"target_name": target["name"]})
+        elif roll < 0.5:
+            await self.request("ls_claim", "POST", f"/api/leitstelle/{admin}/claim",
+                               json={"target_name": target["name"], "sf_name": "LS"})
+        elif roll < 0.6:
+            await self.request("scenario_next", "POST", f"/api/leitstelle/{admin}/scenario/next",
+                               json={"target_name": target["name"]})
+        elif not target.get("active_scenario") and self.scenarios:
+            await self.request("scenario_start", "POST", f"/api/leitstelle/{admin}/scenario/start",
+                               json={"target_name": target["name"], "scenario_name": random.choice(self.scenarios)})
+        elif target.get("active_scenario"):
+            await self.check_next_entry(target)
+
+    async def check_next_entry(self, vehicle: dict):
+        state = vehicle.get("checklist_state") or {}
+        checked = dict(state.get("checked_entries") or {})
+        keys = [e["key"] for e in vehicle["active_scenario"].get("generated_entries", []) if e.get("key")]
+        todo = next((k for k in keys if not checked.get(k)), None)
+        if todo is None:
+            await self.request("scenario_discard", "POST", f"/api/leitstelle/{self.admin_code}/scenario/discard",
+                               json={"target_name": vehicle["name"]})
+            return
+        checked[todo] = True
+        await self.request("checklist_update", "POST", f"/api/leitstelle/{self.admin_code}/scenario/update_state",
+                           json={"target_name": vehicle["name"], "state": {**state, "checked_entries": checked}})
+
+    async def run(self, deadline: float):
+        args = self.args
+        tasks = [self.client_loop(self.admin_code, None, deadline, self.on_ls_update),
+                 self.client_loop(self.sf_code, "SF", deadline)]
+        for name in self.vehicles:
+            tasks.append(self.client_loop(self.vehicle_code, name, deadline))
+        tasks += [self.every(args.ls_interval, deadline, self.ls_action, self.registered[self.admin_code]),
+                  self.every(args.sf_interval, deadline, self.sf_action, self.registered["SF"])]
+        for name in self.vehicles:
+            tasks.append(self.every(args.vehicle_interval, deadline, self.vehicle_actions(name), self.registered[name]))
+        await asyncio.gather(*tasks)
+
+
+async def sample_rss(pid: int, stats: Stats, deadline: float):
+    while time.monotonic() < deadline:
+        rss = rss_bytes(pid)
+        if rss is not None:
+            stats.rss.append(rss)
+        await asyncio.sleep(1)
+
+
+async def run(args, pid: Optional[int]):
+    stats = Stats()
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=30) as client:
+        sessions = [Session(client, stats, args, i) for i in range(args.leitstellen)]
+        created = await asyncio.gather(*(s.create() for s in sessions))
+        sessions = [s for s, ok in zip(sessions, created) if ok]
+        if len(sessions) < args.leitstellen:
+            print(f"{args.leitstellen - len(sessions)} of {args.leitstellen} leitstellen could not be created",
+                  file=sys.stderr)
+        if not sessions:
+            sys.exit(1)
+
+        start = time.monotonic()
+        deadline = start + args.duration
+        tasks = [s.run(deadline) for s in sessions]
+        if pid:
+            tasks.append(sample_rss(pid, stats, deadline))
+        await asyncio.gather(*tasks)
+        elapsed = time.monotonic() - start
+
+    clients = len(sessions) * (args.vehicles + 2)
+    print(f"{len(sessions)} leitstellen, {clients} clients, {args.url}\n")
+    stats.report(elapsed)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server() -> tuple:
+    port = free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--no-access-log"],
+        cwd=SRC_DIR, stdout=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            if httpx.get(f"{url}/api/health").status_code == 200:
+                return proc, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError("server did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", help="server to test; starts a local one if omitted")
+    parser.add_argument("--pid", type=int, help="server process to sample RSS from when --url is given")
+    parser.add_argument("--leitstellen", type=int, default=5)
+    parser.add_argument("--vehicles", type=int, default=20, help="vehicles per leitstelle")
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument("--ws-fraction", type=float, default=0.8,
+                        help="share of clients using the WebSocket, the others poll")
+    parser.add_argument("--poll-interval", type=float, default=2.0,
+                        help="seconds between heartbeats of a polling client")
+    parser.add_argument("--vehicle-interval", type=float, default=20.0, help="mean seconds between vehicle actions")
+    parser.add_argument("--sf-interval", type=float, default=8.0, help="mean seconds between SF actions")
+    parser.add_argument("--ls-interval", type=float, default=3.0, help="mean seconds between LS actions")
+    parser.add_argument("--max-connections", type=int, default=200)
+    args = parser.parse_args()
+
+    proc = None
+    pid = args.pid
+    if not args.url:
+        proc, args.url = start_server()
+        pid = proc.pid
+    try:
+        asyncio.run(run(args, pid))
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    main()
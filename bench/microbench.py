@@ -0,0 +1,246 @@
+"""Microbenchmarks for the ConnectionManager and scenario hot paths.
+
+Results are written as JSON (per benchmark the min and median time per
+call in microseconds plus benchmark-specific figures such as payload
+sizes). The run exits with status 1 if a benchmark fails, and, when
+comparing against an earlier run, if any benchmark got slower than
+``--threshold`` or is missing:
+
+    python bench/microbench.py --save base.json
+    python bench/microbench.py --compare base.json --threshold 0.25
+
+Only compare runs from the same machine; CI runs the base commit and the
+change back to back on one runner.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import timeit
+from typing import Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from manager import CLEANUP_TIMEOUT, PERSIST_FIELDS, ConnectionManager  # type: ignore
+from models import ChecklistState, Connection, LeitstelleData, Notice  # type: ignore
+from scenario_catalog import catalog  # type: ignore
+
+ADMIN = "ADMIN"
+
+
+def _leitstelle(vehicles: int, now: float, stale: int = 0) -> LeitstelleData:
+    """A leitstelle with an SF, an LS and ``vehicles`` vehicles, the first ``stale`` of them timed out."""
+    ls = LeitstelleData(name="Bench", vehicle_code="CAR", staffelfuehrer_code="SF")
+    ls.add_connection(Connection(name="SF", last_update=now, last_status_update=now, last_activity=now,
+                                 is_staffelfuehrer=True))
+    ls.add_connection(Connection(name="Leitstelle", last_update=now, last_status_update=now, last_activity=now,
+                                 is_leitstelle=True))
+    for i in range(vehicles):
+        seen = now - CLEANUP_TIMEOUT - 1 if i < stale else now
+        ls.add_connection(Connection(name=f"Florian {i}", status=str(1 + i % 4), last_update=seen,
+                                     last_status_update=seen, last_activity=seen,
+                                     claimed_by="SF" if i % 3 == 0 else None))
+        ls.notes[f"Florian {i}"] = f"Notiz {i}"
+        if i % 5 == 0:
+            ls.notices[f"Florian {i}"] = Notice(text="Sprechwunsch", status="pending")
+    return ls
+
+
+def _first_scenario():
+    """The first catalog scenario (by name) that generates its entries."""
+    for entry in sorted((e for e in catalog.entries() if e.scenario), key=lambda e: e.name):
+        try:
+            entry.scenario.generate_funksprueche(fk="Florian 0", ls="Bench", start_enr=1)
+        except Exception:
+            continue
+        return entry
+    return None
+
+
+def _scenario_vehicles(ls: LeitstelleData, count: int):
+    """Start the same scenario on the first ``count`` vehicles."""
+    entry = _first_scenario()
+    if entry is None:
+        return
+    for i in range(count):
+        name = f"Florian {i}"
+        data = entry.dump()
+        data["generated_entries"] = [f.model_dump() for f in entry.scenario.generate_funksprueche(
+            fk=name, ls=ls.name, start_enr=ls.next_enr())]
+        ls.active_scenarios[name] = data
+        ls.checklist_states[name] = ChecklistState()
+
+
+def bench_build_status_update(vehicles: int) -> Tuple[Callable, dict]:
+    manager = ConnectionManager()
+    ls = _leitstelle(vehicles, time.time())
+    _scenario_vehicles(ls, min(vehicles, 10))
+    manager.register(ADMIN, ls)
+
+    def run():
+        # Cold build: no per-vehicle or payload cache
+        manager._vehicle_cache.clear()
+        manager._payload_cache.clear()
+        manager.build_status_update(ADMIN)
+    return run, {}
+
+
+def bench_next_todo(entries: int) -> Tuple[Callable, dict]:
+    """Next todo on a scenario with ``entries`` checklist entries, half of them checked."""
+    manager = ConnectionManager()
+    ls = _leitstelle(1, time.time())
+    # The actor mix of a real scenario, repeated to the wanted length
+    actors = [f.actor for f in _first_scenario().scenario.generate_funksprueche(
+        fk="Florian 0", ls=ls.name, start_enr=1)]
+    ls.active_scenarios["Florian 0"] = {"generated_entries": [
+        {"key": f"{i // 100}-{i // 10 % 10}-{i % 10}", "actor": actors[i % len(actors)]} for i in range(entries)
+    ]}
+    keys = [e["key"] for e in ls.active_scenarios["Florian 0"]["generated_entries"]]
+    ls.checklist_states["Florian 0"] = ChecklistState(checked_entries={k: True for k in keys[:entries // 2]})
+    manager.register(ADMIN, ls)
+
+    def run():
+        # A fresh index each time, so the cursor has to walk the checked half
+        manager._checklists.clear()
+        manager._compute_next_todo(ADMIN, ls, "Florian 0")
+    return run, {}
+
+
+def bench_persist_serialize(vehicles: int) -> Tuple[Callable, dict]:
+    """The JSON ``persist`` writes for a full save of every hash field."""
+    ls = _leitstelle(vehicles, time.time())
+    _scenario_vehicles(ls, min(vehicles, 10))
+
+    def run():
+        return {name: ls.model_dump_json(include=fields) for name, fields in PERSIST_FIELDS.items()}
+    sizes = {name: len(value) for name, value in run().items()}
+    return run, {"bytes": sum(sizes.values()), "bytes_per_field": sizes}
+
+
+def bench_generate(entry) -> Tuple[Callable, dict]:
+    def run():
+        return entry.scenario.generate_funksprueche(fk="Florian 1", ls="Bench", start_enr=1)
+    return run, {"entries": len(run())}
+
+
+def bench_cleanup_inactive(leitstellen: int, vehicles: int) -> Tuple[Callable, dict]:
+    """Full sweep over ``leitstellen`` with a tenth of their vehicles timed out."""
+    loop = asyncio.new_event_loop()
+    manager = ConnectionManager()
+
+    def setup():
+        now = time.time()
+        manager.leitstellen.clear()
+        for i in range(leitstellen):
+            manager.register(f"LS{i}", _leitstelle(vehicles, now, stale=vehicles // 10))
+
+    def run():
+        loop.run_until_complete(manager.cleanup_inactive())
+    return run, {"setup": setup}
+
+
+def benchmarks() -> List[Tuple[str, Callable[[], Tuple[Callable, dict]]]]:
+    items = []
+    for n in (10, 100, 1000):
+        items.append((f"build_status_update[{n}]", lambda n=n: bench_build_status_update(n)))
+    for n in (100, 1000):
+        items.append((f"compute_next_todo[{n}]", lambda n=n: bench_next_todo(n)))
+    for n in (10, 100, 1000):
+        items.append((f"persist_serialize[{n}]", lambda n=n: bench_persist_serialize(n)))
+    for entry in sorted(catalog.entries(), key=lambda e: e.name):
+        if entry.scenario:
+            items.append((f"generate_funksprueche[{entry.name}]", lambda e=entry: bench_generate(e)))
+    items.append(("cleanup_inactive[100x100]", lambda: bench_cleanup_inactive(100, 100)))
+    return items
+
+
+def measure(run: Callable, setup: Optional[Callable], min_time: float, repeat: int) -> Dict[str, float]:
+    if setup:
+        # Destructive benchmarks get fresh state for every call
+        times = timeit.repeat(run, setup=setup, number=1, repeat=repeat)
+        number = 1
+    else:
+        number, _ = timeit.Timer(run).autorange()
+        number = max(1, int(number * min_time / 0.2))
+        times = timeit.repeat(run, number=number, repeat=repeat)
+    per_call = [t / number * 1e6 for t in times]
+    return {"min_us": min(per_call), "median_us": statistics.median(per_call), "number": number}
+
+
+def run_all(pattern: str, min_time: float, repeat: int) -> dict:
+    results = {}
+    failed = {}
+    for name, make in benchmarks():
+        if pattern not in name:
+            continue
+        try:
+            run, extra = make()
+            result = measure(run, extra.pop("setup", None), min_time, repeat)
+        except Exception as e:
+            print(f"{name:<72} failed: {e!r}")
+            failed[name] = repr(e)
+            continue
+        result.update(extra)
+        results[name] = result
+        print(f"{name:<72}{result['min_us']:>12.1f} us{result['median_us']:>12.1f} us")
+    return {"python": platform.python_version(), "machine": platform.machine(), "results": results,
+            "failed": failed}
+
+
+def compare(current: dict, baseline: dict, threshold: float, pattern: str = "") -> List[str]:
+    regressions = []
+    for name in baseline["results"]:
+        if pattern in name and name not in current["results"]:
+            regressions.append(f"{name}: missing from this run")
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if not base:
+            continue
+        change = result["min_us"] / base["min_us"] - 1
+        if change > threshold:
+            regressions.append(f"{name}: {base['min_us']:.1f} us -> {result['min_us']:.1f} us (+{change:.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown, 0.25 = 25%%")
+    parser.add_argument("-k", dest="pattern", default="", help="only run benchmarks containing this")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per repetition")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'benchmark':<72}{'min':>15}{'median':>15}")
+    current = run_all(args.pattern, args.min_time, args.repeat)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+
+    status = 0
+    if current["failed"]:
+        print(f"\n{len(current['failed'])} benchmark(s) failed")
+        status = 1
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.threshold, args.pattern)
+        if regressions:
+            print(f"\nSlower than baseline by more than {args.threshold:.0%} or missing:")
+            for line in regressions:
+                print(f"  {line}")
+            status = 1
+        else:
+            print(f"\nNo regressions beyond {args.threshold:.0%}")
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,79 @@
 import { ref, onMounted, onBeforeUnmount } from 'vue'
 import axios from 'axios'
-import type { StatusUpdate } from '../types'
+import type { StatusDelta, StatusUpdate, VehicleStatus } from '../types'
+import { backendBaseUrl } from '../config/backend'
 
 export const REFRESH_KEY = Symbol('pollRefresh') as InjectionKey<() => void>
 
 import type { InjectionKey } from 'vue'
 
+const PING_INTERVAL_MS = 5000
+const RECONNECT_DELAY_MS = 5000
+const MAX_MESSAGES = 200
+// Close code sent when another worker owns this code; the frame before it
+// ({type: 'moved', url}) holds the URL to reconnect to
+const WS_CLOSE_MOVED = 4307
+
+// Merges a delta into the last full state: changed vehicles replace their
+// previous entry, `names` defines which vehicles are still on the board.
+function applyDelta(current: StatusUpdate, delta: StatusDelta): StatusUpdate {
+  const byName = new Map<string, VehicleStatus>(current.connections.map(c => [c.name, c]))
+  for (const c of delta.connections) byName.set(c.name, c)
+  const messages = delta.messages?.length
+    ? [...(current.messages ?? []), ...delta.messages].slice(-MAX_MESSAGES)
+    : current.messages
+  return {
+    ...current,
+    revision: delta.revision,
+    connections: delta.names.map(n => byName.get(n)).filter((c): c is VehicleStatus => !!c),
+    notices: delta.notices ?? current.notices,
+    messages,
+  }
+}
+
+// Receives pushed updates over /ws/{code} and falls back to polling
+// /api/poll/{code} while the socket is unavailable.
 export function usePolling(code: string, name?: string, intervalMs = 2000) {
   const state = ref<StatusUpdate | null>(null)
   const isConnected = ref(false)
   let timer: number | null = null
+  let pingTimer: number | null = null
+  let reconnectTimer: number | null = null
+  let socket: WebSocket | null = null
+  let stopped = false
+
+  const lastSeq = () => state.value?.messages?.at(-1)?.seq
+
+  const applyPayload = (data: any) => {
+    if (data?.type === 'status_update') {
+      // A cursor-trimmed chat continues the one we already have
+      const messages = data.messages_after != null && state.value?.messages
+        ? [...state.value.messages, ...(data.messages ?? [])].slice(-MAX_MESSAGES)
+        : data.messages
+      state.value = { ...data, messages }
+    } else if (data?.type === 'status_delta' && state.value) {
+      state.value = applyDelta(state.value, data)
+    }
+  }
 
   const fetchState = async () => {
     try {
       const params: Record<string, string> = {}
       if (name) params.name = name
+      if (state.value) {
+        // Cheap liveness ping; the board is only fetched when the revision moved
+        const { data: beat } = await axios.post(`/api/heartbeat/${code}`, null, { params })
+        if (beat?.status === 'success' && beat.revision === state.value.revision) {
+          isConnected.value = true
+          return
+        }
+        params.since = String(state.value.revision)
+        const seq = lastSeq()
+        if (seq != null) params.after = String(seq)
+      }
       const { data } = await axios.get(`/api/poll/${code}`, { params })
-      if (data?.type === 'status_update') {
-        state.value = data
+      if (data?.type === 'status_update' || data?.type === 'status_delta' || data?.type === 'unchanged') {
+        applyPayload(data)
         isConnected.value = true
       }
     } catch {
@@ -25,19 +81,74 @@ export function usePolling(code: string, name?: string, intervalMs = 2000) {
     }
   }
 
-  const refresh = () => {
-    if (timer) clearInterval(timer)
+  const startPolling = () => {
+    if (timer) return
     fetchState()
     timer = window.setInterval(fetchState, intervalMs)
   }
 
+  const stopPolling = () => {
+    if (timer) clearInterval(timer)
+    timer = null
+  }
+
+  const connectSocket = (movedTo?: string) => {
+    if (stopped || typeof WebSocket === 'undefined') {
+      startPolling()
+      return
+    }
+    const url = new URL(movedTo ?? `/ws/${code}`, backendBaseUrl)
+    url.protocol = url.protocol === 'https:' || url.protocol === 'wss:' ? 'wss:' : 'ws:'
+    if (name && !movedTo) url.searchParams.set('name', name)
+    const seq = lastSeq()
+    if (seq != null && !movedTo) url.searchParams.set('after', String(seq))
+
+    const ws = new WebSocket(url)
+    socket = ws
+    let redirect: string | undefined
+    ws.onopen = () => {
+      stopPolling()
+      isConnected.value = true
+      pingTimer = window.setInterval(() => ws.send('ping'), PING_INTERVAL_MS)
+    }
+    ws.onmessage = (event) => {
+      const data = JSON.parse(event.data)
+      if (data?.type === 'moved') {
+        redirect = data.url
+        return
+      }
+      applyPayload(data)
+    }
+    ws.onclose = (event) => {
+      if (pingTimer) clearInterval(pingTimer)
+      pingTimer = null
+      socket = null
+      if (stopped) return
+      if (event.code === WS_CLOSE_MOVED && redirect && !movedTo) {
+        connectSocket(redirect)
+        return
+      }
+      startPolling()
+      reconnectTimer = window.setTimeout(() => connectSocket(), RECONNECT_DELAY_MS)
+    }
+  }
+
+  const refresh = () => {
+    // Mutations are pushed over the socket; only the polling fallback needs a nudge.
+    if (socket?.readyState === WebSocket.OPEN) return
+    stopPolling()
+    startPolling()
+  }
+
   onMounted(() => {
-    fetchState()
-    timer = window.setInterval(fetchState, intervalMs)
+    connectSocket()
   })
 
   onBeforeUnmount(() => {
-    if (timer) clearInterval(timer)
+    stopped = true
+    stopPolling()
+    if (reconnectTimer) clearTimeout(reconnectTimer)
+    socket?.close()
   })
 
   return { state, isConnected, refresh }
@@ -21,6 +21,7 @@ export interface VehicleStatus {
   active_scenario: any | null
   next_todo: string | null
   last_activity: number
+  revision: number
   checklist_state: {
     expanded_einsaetze: Record<string, boolean>
     expanded_schritte: Record<string, boolean>
@@ -38,11 +39,26 @@ export interface ChatMessage {
   sender: string
   text: string
   timestamp: number
+  revision: number
+  seq: number
 }
 
 export interface StatusUpdate {
   type: string
+  revision: number
   connections: VehicleStatus[]
   notices: Record<string, Notice>
   messages?: ChatMessage[]
+  // Set when `messages` only holds messages after this chat seq
+  messages_after?: number
+}
+
+export interface StatusDelta {
+  type: 'status_delta'
+  revision: number
+  connections: VehicleStatus[]
+  names: string[]
+  notices: Record<string, Notice> | null
+  messages?: ChatMessage[]
+  messages_after?: number
 }
@@ -1,6 +1,8 @@
-from fastapi import APIRouter, Request
-from fastapi.responses import HTMLResponse, RedirectResponse, FileResponse
-import json
+from fastapi import APIRouter, Depends, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.requests import HTTPConnection
+from fastapi.responses import HTMLResponse, RedirectResponse, FileResponse, Response
+from pydantic_core import to_json
+import anyio
 import uuid
 import time
 import os
@@ -8,18 +10,62 @@ import random
 
 from manager import manager  # type: ignore
 from models import (
-    LeitstelleData, Connection, Notice, ChatMessage,
+    LeitstelleData, Connection, Notice, ChatMessage, ROLE_SF, ROLE_LS, BROADCAST_CHANNEL,
     MessageRequest, TargetRequest, NoticeRequest,
     NoteRequest, StatusRequest, LeitstelleCreateRequest,
     ScenarioStartRequest, ChecklistUpdateRequest, ChecklistState,
     ClaimRequest, VehicleActionRequest, SfChannelRequest,
 )  # type: ignore
 from logging_conf import get_logger  # type: ignore
-from scenario_models import Scenario, FunkEntry  # type: ignore
+from scenario_models import FunkEntry  # type: ignore
+from scenario_catalog import catalog  # type: ignore
+import metrics  # type: ignore
+from profiler import profiler, watchdog  # type: ignore
 
 logger = get_logger("api")
 
-router = APIRouter()
+
+# WebSocket close code telling the client to reconnect elsewhere. Close
+# reasons are limited to 123 bytes, so the URL is sent in a frame before.
+WS_CLOSE_MOVED = 4307
+
+
+async def _fault_in(connection: HTTPConnection):
+    """Make sure the leitstelle behind a ``code`` path/query parameter is in memory.
+
+    It may not be loaded yet (lazy restore) or may have been evicted. With
+    sharding, requests for a leitstelle owned by another worker are
+    redirected there instead.
+    """
+    code = connection.path_params.get("code") or connection.query_params.get("code")
+    if not code:
+        return
+    owner = await manager.owner_url(code)
+    if owner:
+        target = f"{owner}{connection.url.path}"
+        if connection.url.query:
+            target += f"?{connection.url.query}"
+        if connection.scope["type"] == "websocket":
+            # Answered by the endpoint (see _redirect_websocket)
+            connection.state.moved_to = target
+            return
+        # 307 keeps method and body of POSTs
+        raise HTTPException(status_code=307, headers={"Location": target})
+    await manager.ensure_loaded(code)
+
+
+async def _redirect_websocket(websocket: WebSocket) -> bool:
+    """Send a client whose leitstelle lives on another worker there."""
+    target = getattr(websocket.state, "moved_to", None)
+    if not target:
+        return False
+    await websocket.accept()
+    await websocket.send_json({"type": "moved", "url": target})
+    await websocket.close(code=WS_CLOSE_MOVED)
+    return True
+
+
+router = APIRouter(dependencies=[Depends(_fault_in)])
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.dirname(current_dir)
@@ -27,8 +73,6 @@ _frontend_dist_primary = os.path.join(current_dir, "frontend_dist")
 _frontend_dist_legacy = os.path.join(project_root, "frontend", "dist")
 frontend_dist = _frontend_dist_primary if os.path.exists(_frontend_dist_primary) else _frontend_dist_legacy
 
-SCENARIOS_DIR = os.path.join(current_dir, "static", "scenarios")
-
 
 # ---------------------------------------------------------------------------
 # Health
@@ -51,6 +95,32 @@ async def health():
     }
 
 
+@router.get("/metrics")
+async def get_metrics():
+    await manager.collect_metrics()
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@router.get("/api/debug/profile")
+async def profile_event_loop(token: str | None = None, seconds: float = 10, interval_ms: float = 5,
+                             format: str = "json"):
+    """Sample the event loop for ``seconds`` and report its stacks and lag.
+
+    Only available with ``PROFILER_TOKEN`` set. ``format=collapsed`` returns
+    just the stacks for flamegraph tools. The JSON form also lists the
+    watchdog's recent stalls with their stacks.
+    """
+    if not profiler.allowed(token):
+        raise HTTPException(status_code=404)
+    if profiler.busy:
+        raise HTTPException(status_code=409, detail="Profiling already running")
+    result = await profiler.profile(seconds, max(interval_ms, 1) / 1000)
+    if format == "collapsed":
+        return Response(content=result["collapsed"], media_type="text/plain")
+    result["recent_stalls"] = list(watchdog.stalls)
+    return result
+
+
 # ---------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------
@@ -109,30 +179,99 @@ def _handle_status_change(connection: Connection, new_status: str):
         connection.last_update = now
 
 
-def _ensure_scenarios_loaded(admin_code: str):
-    ls = manager.leitstellen.get(admin_code)
-    if not ls or ls.scenarios:
-        return
-    if not os.path.isdir(SCENARIOS_DIR):
-        logger.warning(f"Scenarios directory not found: {SCENARIOS_DIR}")
-        return
-    for fname in os.listdir(SCENARIOS_DIR):
-        if not fname.endswith(".json"):
-            continue
-        fpath = os.path.join(SCENARIOS_DIR, fname)
-        try:
-            with open(fpath, "r", encoding="utf-8") as f:
-                raw = json.load(f)
-            ls.scenarios[raw.get("name") or os.path.splitext(fname)[0]] = raw
-        except Exception as e:
-            logger.error(f"Failed to load scenario {fname}: {e}")
+async def _append_chat(admin_code: str, ls: LeitstelleData, vehicle_name: str, sender: str, text: str):
+    await manager.append_chat(admin_code, vehicle_name, ChatMessage(
+        sender=sender, text=text, timestamp=time.time(), revision=ls.revision,
+    ))
+
+
+def _json(body: bytes) -> Response:
+    """Pre-serialized JSON, skipping FastAPI's jsonable_encoder pass."""
+    return Response(content=body, media_type="application/json")
+
+
+def _status_json(admin_code: str, ls: LeitstelleData, vehicle_name: str | None, since: int | None,
+                 after: int | None = None) -> tuple[str, bytes] | None:
+    """``(type, JSON)`` of the full status (``since`` is None) or delta since a revision, plus the vehicle's chat.
+
+    The board part is the cached serialization shared by all pollers; the
+    vehicle's messages are spliced into it. With an ``after`` cursor only
+    messages with a higher ``seq`` are included and ``messages_after`` tells
+    the client to append rather than replace.
+    """
+    status = manager.status_json(admin_code, since)
+    if status is None:
+        return None
+    kind, body = status
+    if not vehicle_name or kind == "unchanged":
+        return status
+
+    if after is not None:
+        history = ls.chat_for(vehicle_name, after)
+        tail = b',"messages_after":' + str(after).encode()
+    else:
+        history = ls.chat_for(vehicle_name)
+        if kind == "status_delta":
+            history = [m for m in history if m.revision > since]
+        tail = b""
+    return kind, body[:-1] + b',"messages":' + to_json(history) + tail + b"}"
+
+
+def _register_client(ls: LeitstelleData, admin_code: str, code_upper: str, name: str | None) -> bool:
+    """Record a heartbeat for the client behind ``code_upper``/``name``.
 
+    Creates the connection on first contact. Returns True if the board changed
+    for other clients (new connection, rename or an offline client coming back).
+    """
+    now = time.time()
+
+    if ls.vehicle_code == code_upper and name:
+        conn = manager.find_connection(ls, name)
+        if conn:
+            was_online = not manager.is_offline(admin_code, name)
+            conn.last_update = now
+            manager.note_heartbeat(admin_code, conn)
+            return not was_online
+        manager.add_connection(admin_code, Connection(
+            name=name, last_update=now,
+            last_status_update=now, last_activity=now,
+        ))
+        ls.bump(name)
+        return True
+
+    elif ls.staffelfuehrer_code == code_upper and name:
+        sf_conn = next(iter(ls.operators(ROLE_SF)), None)
+        if sf_conn:
+            renamed = sf_conn.name != name
+            if renamed:
+                ls.bump(*ls.claimed_vehicles(claimed_by={sf_conn.name, name}))
+                ls.rename_connection(sf_conn, name)
+                manager.track(admin_code, sf_conn)
+            sf_conn.last_update = now
+            manager.note_heartbeat(admin_code, sf_conn)
+            return renamed
+        manager.add_connection(admin_code, Connection(
+            name=name, last_update=now,
+            last_status_update=now, last_activity=now,
+            is_staffelfuehrer=True,
+        ))
+        return True
+
+    elif code_upper == admin_code:
+        ls_name = name or "Leitstelle"
+        ls_conn = ls.get_connection(ls_name, ROLE_LS)
+        if ls_conn:
+            ls_conn.last_update = now
+            manager.note_heartbeat(admin_code, ls_conn)
+            return False
+        manager.add_connection(admin_code, Connection(
+            name=ls_name, last_update=now,
+            last_status_update=now, last_activity=now,
+            is_leitstelle=True,
+        ))
+        return True
 
-def _append_chat(ls: LeitstelleData, vehicle_name: str, sender: str, text: str):
-    history = ls.chat_history.setdefault(vehicle_name, [])
-    history.append(ChatMessage(sender=sender, text=text, timestamp=time.time()))
-    if len(history) > 200:
-        history[:] = history[-200:]
+    return False
 
 
 # ---------------------------------------------------------------------------
@@ -200,6 +339,9 @@ async def get_status_page(request: Request, code: str, name: str):
 @router.post("/leitstelle")
 async def create_leitstelle(request: LeitstelleCreateRequest):
     admin_code = str(uuid.uuid4())[:8].upper()
+    # With sharding, pick a code this worker owns so no hand-over is needed
+    while not manager.owns(admin_code):
+        admin_code = str(uuid.uuid4())[:8].upper()
     vehicle_code = str(uuid.uuid4())[:8].upper()
     staffelfuehrer_code = str(uuid.uuid4())[:8].upper()
 
@@ -209,14 +351,12 @@ async def create_leitstelle(request: LeitstelleCreateRequest):
         staffelfuehrer_code = str(uuid.uuid4())[:8].upper()
         codes = {admin_code, vehicle_code, staffelfuehrer_code}
 
-    manager.leitstellen[admin_code] = LeitstelleData(
+    manager.register(admin_code, LeitstelleData(
         name=request.name,
         vehicle_code=vehicle_code,
         staffelfuehrer_code=staffelfuehrer_code,
-    )
-    manager.code_to_admin[vehicle_code] = admin_code
-    manager.code_to_admin[staffelfuehrer_code] = admin_code
-    await manager.persist(admin_code)
+    ))
+    await manager.commit(admin_code)
     return {
         "status": "success",
         "admin_code": admin_code,
@@ -260,60 +400,94 @@ async def get_status_info(code: str, name: str):
 # ---------------------------------------------------------------------------
 
 @router.get("/api/poll/{code}")
-async def poll(code: str, name: str | None = None):
+async def poll(code: str, name: str | None = None, since: int | None = None, after: int | None = None):
     code_upper = code.upper()
     admin_code = manager.resolve_admin_code(code_upper)
     if not admin_code:
         return _error("Invalid code")
 
     ls = manager.leitstellen[admin_code]
-    now = time.time()
+    metrics.POLLS.inc(metrics.leitstelle_id(admin_code))
+    if _register_client(ls, admin_code, code_upper, name):
+        await manager.commit(admin_code, "connections")
 
-    if ls.vehicle_code == code_upper and name:
-        conn = manager.find_connection(ls, name)
-        if conn:
-            conn.last_update = now
-        else:
-            conn = Connection(
-                name=name, last_update=now,
-                last_status_update=now, last_activity=now,
-            )
-            ls.connections.append(conn)
+    vehicle_name = name if ls.vehicle_code == code_upper else None
+    status = _status_json(admin_code, ls, vehicle_name, since, after)
+    if status is None:
+        return _error("Failed to build status")
+    return _json(status[1])
 
-    elif ls.staffelfuehrer_code == code_upper and name:
-        sf_conn = next((c for c in ls.connections if c.is_staffelfuehrer), None)
-        if sf_conn:
-            sf_conn.name = name
-            sf_conn.last_update = now
-        else:
-            ls.connections.append(Connection(
-                name=name, last_update=now,
-                last_status_update=now, last_activity=now,
-                is_staffelfuehrer=True,
-            ))
 
-    elif code_upper == admin_code:
-        ls_name = name or "Leitstelle"
-        ls_conn = next((c for c in ls.connections if c.is_leitstelle and c.name == ls_name), None)
-        if ls_conn:
-            ls_conn.last_update = now
-        else:
-            ls.connections.append(Connection(
-                name=ls_name, last_update=now,
-                last_status_update=now, last_activity=now,
-                is_leitstelle=True,
-            ))
-
-    update = manager.build_status_update(admin_code)
-    if not update:
-        return _error("Failed to build status")
+@router.post("/api/heartbeat/{code}")
+async def heartbeat(code: str, name: str | None = None):
+    """Liveness only: no board is built. Clients fetch /api/poll when ``revision`` moved."""
+    code_upper = code.upper()
+    admin_code = manager.resolve_admin_code(code_upper)
+    if not admin_code:
+        return _error("Invalid code")
+
+    ls = manager.leitstellen[admin_code]
+    if _register_client(ls, admin_code, code_upper, name):
+        await manager.commit(admin_code, "connections")
+    return {"status": "success", "revision": ls.revision}
 
-    response = update.model_dump()
 
-    if ls.vehicle_code == code_upper and name:
-        response["messages"] = [m.model_dump() for m in ls.chat_history.get(name, [])]
+@router.websocket("/ws/{code}")
+async def websocket_updates(websocket: WebSocket, code: str, name: str | None = None, after: int | None = None):
+    """Push channel replacing /api/poll.
+
+    Every frame the client sends counts as a heartbeat. The first message is a
+    full status update, later ones are deltas pushed whenever a mutation
+    commits. /api/poll stays available as fallback. ``after`` (the last chat
+    ``seq`` a reconnecting client has) trims the chat of the first message.
+    """
+    if await _redirect_websocket(websocket):
+        return
+    code_upper = code.upper()
+    admin_code = manager.resolve_admin_code(code_upper)
+    if not admin_code:
+        await websocket.close(code=4404)
+        return
+
+    await websocket.accept()
+    ls = manager.leitstellen[admin_code]
+    vehicle_name = name if ls.vehicle_code == code_upper else None
+
+    if _register_client(ls, admin_code, code_upper, name):
+        await manager.commit(admin_code, "connections")
+    queue = manager.subscribe(admin_code)
+
+    async def send_updates():
+        since = None
+        while True:
+            revision = ls.revision
+            status = _status_json(admin_code, ls, vehicle_name, since, after if since is None else None)
+            if status is None:
+                # Leitstelle handed over to another worker; the client reconnects
+                tg.cancel_scope.cancel()
+                return
+            if status[0] != "unchanged":
+                await websocket.send_text(status[1].decode())
+            since = revision
+            # Commits and online/offline transitions (manager.expiry_loop) wake us
+            await queue.get()
+
+    async def receive_heartbeats():
+        try:
+            while True:
+                await websocket.receive_text()
+                if _register_client(ls, admin_code, code_upper, name):
+                    await manager.commit(admin_code, "connections")
+        except WebSocketDisconnect:
+            pass
+        tg.cancel_scope.cancel()
 
-    return response
+    try:
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(send_updates)
+            tg.start_soon(receive_heartbeats)
+    finally:
+        manager.unsubscribe(admin_code, queue)
 
 
 # ---------------------------------------------------------------------------
@@ -353,7 +527,8 @@ async def vehicle_action(code: str, request: VehicleActionRequest):
         case _:
             return _error(f"Unknown action: {request.action}")
 
-    await manager.persist(admin_code)
+    ls.bump(request.name, notices=request.action == "confirm_notice")
+    await manager.commit(admin_code, "connections", "notices")
     return {"status": "success"}
 
 
@@ -369,24 +544,22 @@ async def send_message(code: str, request: MessageRequest):
 
     sender = "LS" if code.upper() == admin_code else "SF"
 
-    if request.target_name:
-        _append_chat(ls, request.target_name, sender, request.message)
-    else:
-        for conn in ls.connections:
-            if not conn.is_staffelfuehrer and not conn.is_leitstelle:
-                _append_chat(ls, conn.name, sender, request.message)
+    ls.bump()
+    # A broadcast is stored once and merged into every vehicle's chat on read
+    await _append_chat(admin_code, ls, request.target_name or BROADCAST_CHANNEL, sender, request.message)
 
-    await manager.persist(admin_code)
+    # The messages themselves are queued by append_chat
+    await manager.commit(admin_code, "meta")
     return {"status": "success"}
 
 
 @router.get("/api/leitstelle/{code}/chat_history")
-async def get_chat_history(code: str, target_name: str):
+async def get_chat_history(code: str, target_name: str, after: int = 0):
     admin_code, ls = _require_leitstelle(code)
     if not admin_code:
         return _error("Invalid code")
-    history = ls.chat_history.get(target_name, [])
-    return {"status": "success", "messages": [m.model_dump() for m in history]}
+    history = ls.chat_for(target_name, after)
+    return _json(to_json({"status": "success", "messages": history}))
 
 
 # ---------------------------------------------------------------------------
@@ -398,13 +571,15 @@ async def clear_special(code: str, request: TargetRequest):
     admin_code = code.upper()
     if admin_code not in manager.leitstellen:
         return _error("Leitstelle not found")
-    conn = manager.find_connection(manager.leitstellen[admin_code], request.target_name)
+    ls = manager.leitstellen[admin_code]
+    conn = manager.find_connection(ls, request.target_name)
     if not conn:
         return _error("Vehicle not found")
     conn.special = None
     conn.last_blitz_update = None
     conn.last_sprechwunsch_update = None
-    await manager.persist(admin_code)
+    ls.bump(conn.name)
+    await manager.commit(admin_code, "connections")
     return {"status": "success"}
 
 
@@ -413,12 +588,14 @@ async def clear_kurzstatus(code: str, request: TargetRequest):
     admin_code = code.upper()
     if admin_code not in manager.leitstellen:
         return _error("Leitstelle not found")
-    conn = manager.find_connection(manager.leitstellen[admin_code], request.target_name)
+    ls = manager.leitstellen[admin_code]
+    conn = manager.find_connection(ls, request.target_name)
     if not conn:
         return _error("Vehicle not found")
     conn.kurzstatus = None
     conn.last_update = time.time()
-    await manager.persist(admin_code)
+    ls.bump(conn.name)
+    await manager.commit(admin_code, "connections")
     return {"status": "success"}
 
 
@@ -431,7 +608,8 @@ async def update_note(code: str, request: NoteRequest):
         ls.notes[request.target_name] = request.note
     else:
         ls.sf_notes[request.target_name] = request.note
-    await manager.persist(admin_code)
+    ls.bump(request.target_name)
+    await manager.commit(admin_code, "notes", "sf_notes")
     return {"status": "success"}
 
 
@@ -440,14 +618,16 @@ async def set_status(code: str, request: StatusRequest):
     admin_code = code.upper()
     if admin_code not in manager.leitstellen:
         return _error("Leitstelle not found")
-    conn = manager.find_connection(manager.leitstellen[admin_code], request.target_name)
+    ls = manager.leitstellen[admin_code]
+    conn = manager.find_connection(ls, request.target_name)
     if not conn:
         return _error("Vehicle not found")
     conn.status = request.status
     now = time.time()
     conn.last_status_update = now
     conn.last_update = now
-    await manager.persist(admin_code)
+    ls.bump(conn.name)
+    await manager.commit(admin_code, "connections")
     return {"status": "success"}
 
 
@@ -456,13 +636,15 @@ async def ls_claim_vehicle(code: str, request: ClaimRequest):
     admin_code = code.upper()
     if admin_code not in manager.leitstellen:
         return _error("Leitstelle not found")
-    conn = manager.find_connection(manager.leitstellen[admin_code], request.target_name)
+    ls = manager.leitstellen[admin_code]
+    conn = manager.find_connection(ls, request.target_name)
     if not conn:
         return _error("Vehicle not found")
     if conn.ls_claimed_by and conn.ls_claimed_by != request.sf_name:
         return _error("Vehicle already claimed by another operator")
     conn.ls_claimed_by = request.sf_name
-    await manager.persist(admin_code)
+    ls.bump(conn.name)
+    await manager.commit(admin_code, "connections")
     return {"status": "success"}
 
 
@@ -471,11 +653,13 @@ async def ls_unclaim_vehicle(code: str, request: TargetRequest):
     admin_code = code.upper()
     if admin_code not in manager.leitstellen:
         return _error("Leitstelle not found")
-    conn = manager.find_connection(manager.leitstellen[admin_code], request.target_name)
+    ls = manager.leitstellen[admin_code]
+    conn = manager.find_connection(ls, request.target_name)
     if not conn:
         return _error("Vehicle not found")
     conn.ls_claimed_by = None
-    await manager.persist(admin_code)
+    ls.bump(conn.name)
+    await manager.commit(admin_code, "connections")
     return {"status": "success"}
 
 
@@ -484,14 +668,13 @@ async def set_ls_channel(code: str, request: SfChannelRequest):
     admin_code = code.upper()
     if admin_code not in manager.leitstellen:
         return _error("Leitstelle not found")
-    ls_conn = next(
-        (c for c in manager.leitstellen[admin_code].connections if c.is_leitstelle and c.name == request.name),
-        None,
-    )
+    ls = manager.leitstellen[admin_code]
+    ls_conn = ls.get_connection(request.name, ROLE_LS)
     if not ls_conn:
         return _error("LS connection not found")
     ls_conn.radio_channel = request.channel if request.channel else None
-    await manager.persist(admin_code)
+    ls.bump(*ls.claimed_vehicles(ls_claimed_by={ls_conn.name}))
+    await manager.commit(admin_code, "connections")
     return {"status": "success"}
 
 
@@ -512,12 +695,13 @@ async def send_notice(code: str, request: NoticeRequest):
         return _error("You must claim the vehicle before requesting it")
 
     if request.sf_name:
-        sf_conn = next((c for c in ls.connections if c.name == request.sf_name and c.is_staffelfuehrer), None)
+        sf_conn = ls.get_connection(request.sf_name, ROLE_SF)
         if sf_conn:
             target.radio_channel = sf_conn.radio_channel
 
     ls.notices[request.target_name] = Notice(text=request.text, status="pending")
-    await manager.persist(admin_code)
+    ls.bump(target.name, notices=True)
+    await manager.commit(admin_code, "connections", "notices")
     return {"status": "success"}
 
 
@@ -528,7 +712,8 @@ async def acknowledge_notice(code: str, request: TargetRequest):
         return _error("Invalid code")
     if request.target_name in ls.notices:
         del ls.notices[request.target_name]
-        await manager.persist(admin_code)
+        ls.bump(notices=True)
+        await manager.commit(admin_code, "notices")
         return {"status": "success"}
     return _error("Notice not found")
 
@@ -544,7 +729,8 @@ async def claim_vehicle(code: str, request: ClaimRequest):
     if conn.claimed_by and conn.claimed_by != request.sf_name:
         return _error("Vehicle already claimed by someone else")
     conn.claimed_by = request.sf_name
-    await manager.persist(admin_code)
+    ls.bump(conn.name)
+    await manager.commit(admin_code, "connections")
     return {"status": "success"}
 
 
@@ -557,7 +743,8 @@ async def unclaim_vehicle(code: str, request: TargetRequest):
     if not conn:
         return _error("Vehicle not found")
     conn.claimed_by = None
-    await manager.persist(admin_code)
+    ls.bump(conn.name)
+    await manager.commit(admin_code, "connections")
     return {"status": "success"}
 
 
@@ -566,11 +753,12 @@ async def set_sf_channel(code: str, request: SfChannelRequest):
     admin_code, ls = _require_sf(code)
     if not admin_code:
         return _error("Invalid code")
-    sf_conn = next((c for c in ls.connections if c.name == request.name and c.is_staffelfuehrer), None)
+    sf_conn = ls.get_connection(request.name, ROLE_SF)
     if not sf_conn:
         return _error("SF connection not found")
     sf_conn.radio_channel = request.channel if request.channel else None
-    await manager.persist(admin_code)
+    ls.bump(*ls.claimed_vehicles(claimed_by={sf_conn.name}))
+    await manager.commit(admin_code, "connections")
     return {"status": "success"}
 
 
@@ -583,9 +771,7 @@ async def list_scenarios(code: str):
     admin_code = code.upper()
     if admin_code not in manager.leitstellen:
         return _error("Leitstelle nicht gefunden")
-    _ensure_scenarios_loaded(admin_code)
-    ls = manager.leitstellen[admin_code]
-    items = [{"name": n, "beschreibung": r.get("beschreibung", "")} for n, r in ls.scenarios.items()]
+    items = [{"name": e.name, "beschreibung": e.beschreibung} for e in catalog.entries()]
     return {"status": "success", "scenarios": items}
 
 
@@ -595,30 +781,27 @@ async def start_scenario(code: str, request: ScenarioStartRequest):
     if admin_code not in manager.leitstellen:
         return _error("Leitstelle nicht gefunden")
 
-    _ensure_scenarios_loaded(admin_code)
     ls = manager.leitstellen[admin_code]
 
-    if request.scenario_name not in ls.scenarios:
+    entry = catalog.get(request.scenario_name)
+    if not entry:
         return _error("Szenario nicht gefunden")
-
-    try:
-        scenario_obj = Scenario.model_validate(ls.scenarios[request.scenario_name])
-    except Exception as e:
-        logger.error(f"Fehler beim Validieren des Szenarios {request.scenario_name}: {e}")
+    if not entry.scenario:
         return _error("Szenario fehlerhaft")
 
-    funksprueche = scenario_obj.generate_funksprueche(
+    funksprueche = entry.scenario.generate_funksprueche(
         fk=request.target_name, ls=ls.name, start_enr=ls.next_enr(),
     )
 
-    scenario_data = scenario_obj.model_dump()
+    scenario_data = entry.dump()
     scenario_data["generated_entries"] = [
         f.model_dump() if isinstance(f, FunkEntry) else f for f in funksprueche
     ]
 
     ls.active_scenarios[request.target_name] = scenario_data
     ls.checklist_states[request.target_name] = ChecklistState()
-    await manager.persist(admin_code)
+    ls.bump(request.target_name)
+    await manager.commit(admin_code, "active_scenarios", "checklist_states")
     return {"status": "success"}
 
 
@@ -630,7 +813,8 @@ async def discard_scenario(code: str, request: TargetRequest):
     ls = manager.leitstellen[admin_code]
     ls.active_scenarios.pop(request.target_name, None)
     ls.checklist_states.pop(request.target_name, None)
-    await manager.persist(admin_code)
+    ls.bump(request.target_name)
+    await manager.commit(admin_code, "active_scenarios", "checklist_states")
     return {"status": "success"}
 
 
@@ -647,9 +831,11 @@ async def update_checklist_state(code: str, request: ChecklistUpdateRequest):
             conn = manager.find_connection(ls, request.target_name)
             if conn:
                 conn.last_activity = time.time()
+        manager.update_checklist(admin_code, request.target_name, old_checked, request.state.checked_entries)
 
     ls.checklist_states[request.target_name] = request.state
-    await manager.persist(admin_code)
+    ls.bump(request.target_name)
+    await manager.commit(admin_code, "connections", "checklist_states")
     return {"status": "success"}
 
 
@@ -663,31 +849,25 @@ async def next_scenario(code: str, request: TargetRequest):
     if not vehicle_name:
         return _error("Fahrzeugname fehlt")
 
-    _ensure_scenarios_loaded(admin_code)
     ls = manager.leitstellen[admin_code]
 
     used = set(ls.used_scenarios.get(vehicle_name, []))
-    candidates = [n for n in ls.scenarios if n not in used]
+    candidates = [n for n in catalog.names() if n not in used]
     if not candidates:
         return _error("Keine unbenutzten Szenarien mehr verfügbar")
 
     chosen_name = random.choice(candidates)
-    raw = ls.scenarios[chosen_name]
-
-    try:
-        scenario = Scenario.model_validate(raw)
-    except Exception as e:
-        logger.error(f"Fehler beim Laden des Szenarios {chosen_name}: {e}")
+    entry = catalog.get(chosen_name)
+    if not entry.scenario:
         return _error(f"Szenario fehlerhaft: {chosen_name}")
 
-    funke = scenario.generate_funksprueche(fk=vehicle_name, ls=ls.name, start_enr=ls.next_enr())
+    funke = entry.scenario.generate_funksprueche(fk=vehicle_name, ls=ls.name, start_enr=ls.next_enr())
     ls.used_scenarios.setdefault(vehicle_name, []).append(chosen_name)
 
-    await manager.persist(admin_code)
+    await manager.commit(admin_code, "meta")
 
-    entries = [e.model_dump() if isinstance(e, FunkEntry) else e for e in funke]
-    return {
+    return _json(to_json({
         "status": "success",
-        "scenario": {"name": chosen_name, "beschreibung": raw.get("beschreibung", "")},
-        "entries": entries,
-    }
+        "scenario": {"name": chosen_name, "beschreibung": entry.beschreibung},
+        "entries": funke,
+    }))
@@ -1,14 +1,13 @@
 """Demo mode: populates a leitstelle with simulated vehicles that act autonomously."""
 
 import asyncio
-import json
-import os
 import random
 import time
 
 from manager import manager  # type: ignore
 from models import LeitstelleData, Connection, ChatMessage, ChecklistState, Notice  # type: ignore
-from scenario_models import Scenario, FunkEntry  # type: ignore
+from scenario_models import FunkEntry  # type: ignore
+from scenario_catalog import catalog  # type: ignore
 from logging_conf import get_logger  # type: ignore
 
 logger = get_logger("demo")
@@ -56,28 +55,26 @@ VALID_NEXT = {
     "8": ["1"],
 }
 
-SCENARIOS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "scenarios")
-
-
-def _load_random_scenario():
-    files = [f for f in os.listdir(SCENARIOS_DIR) if f.endswith(".json")]
-    if not files:
-        return None
-    path = os.path.join(SCENARIOS_DIR, random.choice(files))
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+# Persist fields each simulated action touches
+ACTION_FIELDS = {
+    "status": ("connections",),
+    "kurzstatus": ("connections",),
+    "clear_kurzstatus": ("connections",),
+    "special": ("connections",),
+    "message": ("meta",),
+    "toggle_sf": ("connections",),
+    "scenario": ("active_scenarios", "checklist_states"),
+    "notice": ("notices",),
+    "checklist_tick": ("connections", "active_scenarios", "checklist_states"),
+}
 
 
 def _start_scenario_for(ls: LeitstelleData, vehicle_name: str):
-    raw = _load_random_scenario()
-    if not raw:
-        return
-    try:
-        scenario = Scenario.model_validate(raw)
-    except Exception:
+    entry = catalog.random_valid()
+    if not entry:
         return
-    entries = scenario.generate_funksprueche(fk=vehicle_name, ls=ls.name, start_enr=ls.next_enr())
-    data = scenario.model_dump()
+    entries = entry.scenario.generate_funksprueche(fk=vehicle_name, ls=ls.name, start_enr=ls.next_enr())
+    data = entry.dump()
     data["generated_entries"] = [e.model_dump() if isinstance(e, FunkEntry) else e for e in entries]
     ls.active_scenarios[vehicle_name] = data
     ls.checklist_states[vehicle_name] = ChecklistState()
@@ -86,7 +83,11 @@ def _start_scenario_for(ls: LeitstelleData, vehicle_name: str):
 async def run_demo():
     await asyncio.sleep(1)
 
-    if ADMIN_CODE in manager.leitstellen:
+    if not manager.owns(ADMIN_CODE):
+        logger.info("Demo leitstelle is owned by another worker, not simulating here")
+        return
+
+    if await manager.ensure_loaded(ADMIN_CODE):
         logger.info("Demo leitstelle already exists (restored from Redis), skipping creation")
         ls = manager.leitstellen[ADMIN_CODE]
     else:
@@ -95,13 +96,11 @@ async def run_demo():
             vehicle_code=VEHICLE_CODE,
             staffelfuehrer_code=SF_CODE,
         )
-        manager.leitstellen[ADMIN_CODE] = ls
-        manager.code_to_admin[VEHICLE_CODE] = ADMIN_CODE
-        manager.code_to_admin[SF_CODE] = ADMIN_CODE
+        manager.register(ADMIN_CODE, ls)
 
         now = time.time()
         for name in VEHICLES:
-            ls.connections.append(Connection(
+            ls.add_connection(Connection(
                 name=name,
                 last_update=now,
                 last_status_update=now,
@@ -113,7 +112,7 @@ async def run_demo():
         for v in random.sample(VEHICLES, min(3, len(VEHICLES))):
             _start_scenario_for(ls, v)
 
-        await manager.persist(ADMIN_CODE)
+        await manager.commit(ADMIN_CODE)
 
     logger.info("=" * 60)
     logger.info("  DEMO MODE ACTIVE")
@@ -137,9 +136,8 @@ async def _heartbeat_loop(ls: LeitstelleData):
     """Keep all demo vehicles online."""
     while True:
         now = time.time()
-        for c in ls.connections:
-            if not c.is_staffelfuehrer and not c.is_leitstelle:
-                c.last_update = now
+        for c in ls.vehicles():
+            c.last_update = now
         await asyncio.sleep(5)
 
 
@@ -148,7 +146,7 @@ async def _action_loop(ls: LeitstelleData):
     while True:
         await asyncio.sleep(random.uniform(2, 6))
 
-        vehicles = [c for c in ls.connections if not c.is_staffelfuehrer and not c.is_leitstelle]
+        vehicles = list(ls.vehicles())
         if not vehicles:
             continue
 
@@ -190,10 +188,9 @@ async def _action_loop(ls: LeitstelleData):
                     vehicle.last_sprechwunsch_update = now
 
         elif action == "message":
-            history = ls.chat_history.setdefault(vehicle.name, [])
-            history.append(ChatMessage(sender="LS", text=random.choice(LS_MESSAGES), timestamp=now))
-            if len(history) > 200:
-                history[:] = history[-200:]
+            await manager.append_chat(ADMIN_CODE, vehicle.name, ChatMessage(
+                sender="LS", text=random.choice(LS_MESSAGES), timestamp=now, revision=ls.bump(),
+            ))
 
         elif action == "toggle_sf":
             vehicle.talking_to_sf = not vehicle.talking_to_sf
@@ -220,47 +217,20 @@ async def _action_loop(ls: LeitstelleData):
 
         elif action == "checklist_tick":
             state = ls.checklist_states.get(vehicle.name)
-            scen = ls.active_scenarios.get(vehicle.name)
-            if state and scen:
-                entries = scen.get("generated_entries", [])
-                # Find next unchecked entry
-                for i, entry in enumerate(entries):
-                    msg = entry.get("message", "")
-                    if not msg.startswith("[[E"):
-                        continue
-                    end_e = msg.find("]]", 3)
-                    e_part = msg[3:end_e]
-                    s_start = msg.find("[[S", end_e)
-                    end_s = msg.find("]]", s_start + 3)
-                    s_part = msg[s_start + 3:end_s]
-                    prefix = msg[:end_s + 2]
-                    f_idx = sum(1 for prev in entries[:i] if prev.get("message", "").startswith(prefix))
-                    key = f"{e_part}-{s_part}-{f_idx}"
-                    if not state.checked_entries.get(key):
+            index = manager.checklist_index(ADMIN_CODE, vehicle.name)
+            if state and index:
+                pos = index.first_unchecked(state.checked_entries)
+                if pos is not None:
+                    # Check a few consecutive entries at once
+                    for key in index.keys[pos:pos + 1 + random.randint(0, 3)]:
                         state.checked_entries[key] = True
-                        vehicle.last_activity = now
-                        # Check a few consecutive entries at once
-                        for _ in range(random.randint(0, 3)):
-                            i += 1
-                            if i >= len(entries):
-                                break
-                            msg2 = entries[i].get("message", "")
-                            if not msg2.startswith("[[E"):
-                                continue
-                            end_e2 = msg2.find("]]", 3)
-                            e2 = msg2[3:end_e2]
-                            s_start2 = msg2.find("[[S", end_e2)
-                            end_s2 = msg2.find("]]", s_start2 + 3)
-                            s2 = msg2[s_start2 + 3:end_s2]
-                            prefix2 = msg2[:end_s2 + 2]
-                            f2 = sum(1 for prev in entries[:i] if prev.get("message", "").startswith(prefix2))
-                            state.checked_entries[f"{e2}-{s2}-{f2}"] = True
-                        break
+                    vehicle.last_activity = now
                 # If all checked, discard and start new
-                total = len([e for e in entries if e.get("message", "").startswith("[[E")])
                 done = sum(1 for v in state.checked_entries.values() if v)
-                if total > 0 and done >= total:
+                if index.keys and done >= len(index.keys):
                     del ls.active_scenarios[vehicle.name]
                     del ls.checklist_states[vehicle.name]
 
-        await manager.persist(ADMIN_CODE)
+        if action != "message":
+            ls.bump(vehicle.name, notices=action == "notice")
+        await manager.commit(ADMIN_CODE, *ACTION_FIELDS[action])
@@ -9,17 +9,41 @@ from contextlib import asynccontextmanager
 from api import router, frontend_dist  # type: ignore
 from manager import manager  # type: ignore
 from logging_conf import setup_logging  # type: ignore
+from metrics import MetricsMiddleware  # type: ignore
+from profiler import profiler, watchdog  # type: ignore
 
 setup_logging()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    manager.chat_history_limit = int(os.getenv("CHAT_HISTORY_LIMIT", manager.chat_history_limit))
+    manager.chat_archive_maxlen = int(os.getenv("CHAT_ARCHIVE_MAXLEN", manager.chat_archive_maxlen))
     redis_url = os.getenv("REDIS_URL")
     if redis_url:
-        await manager.init_redis(redis_url)
-
-    tasks = [asyncio.create_task(cleanup_task())]
+        lazy = os.getenv("REDIS_LAZY_LOAD", "").lower() in ("1", "true", "yes")
+        await manager.init_redis(redis_url, lazy=lazy)
+    manager.persist_interval_ms = int(os.getenv("PERSIST_INTERVAL_MS", manager.persist_interval_ms))
+    manager.max_in_memory = int(os.getenv("MAX_LEITSTELLEN_IN_MEMORY", manager.max_in_memory))
+    manager.idle_evict_seconds = int(os.getenv("LEITSTELLE_IDLE_EVICT_SECONDS", manager.idle_evict_seconds))
+    # Enables /api/debug/profile for requests carrying this token
+    profiler.token = os.getenv("PROFILER_TOKEN") or None
+    watchdog.threshold = float(os.getenv("LOOP_STALL_THRESHOLD_MS", watchdog.threshold * 1000)) / 1000
+
+    if os.getenv("MULTI_WORKER", "").lower() in ("1", "true", "yes"):
+        await manager.enable_sync()
+
+    # Advertised URL of this worker; enables sharded ownership of leitstellen
+    shard_url = os.getenv("SHARD_URL")
+    if shard_url:
+        manager.lease_ttl_ms = int(os.getenv("WORKER_LEASE_TTL_MS", manager.lease_ttl_ms))
+        await manager.enable_sharding(shard_url)
+
+    tasks = [asyncio.create_task(cleanup_task()), asyncio.create_task(manager.expiry_loop())]
+    if watchdog.threshold > 0:
+        tasks.append(asyncio.create_task(watchdog.run()))
+    if manager._redis:
+        tasks.append(asyncio.create_task(manager.persist_loop()))
 
     if os.getenv("DEMO_MODE", "").lower() in ("1", "true", "yes"):
         from demo import run_demo  # type: ignore
@@ -42,6 +66,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 static_dir = os.path.join(current_dir, "static")
@@ -57,9 +82,10 @@ if os.path.exists(frontend_dist):
 
 
 async def cleanup_task():
+    # Stale connections are removed by manager.expiry_loop
     while True:
         await asyncio.sleep(60)
-        await manager.cleanup_inactive()
+        await manager.evict_idle()
 
 
 if __name__ == "__main__":
@@ -1,80 +1,797 @@
+import asyncio
+import heapq
+import json
 import time
-from typing import Dict, Optional, Tuple
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple
 
-from models import LeitstelleData, Connection, VehicleStatus, StatusUpdate  # type: ignore
+from pydantic_core import to_json
+
+from models import (
+    LeitstelleData, Connection, ChatMessage, VehicleStatus, StatusUpdate, StatusDelta, StatusUnchanged,
+    ROLE_VEHICLE, ROLE_SF, ROLE_LS, CHAT_HISTORY_LIMIT,
+)  # type: ignore
+from scenario_models import index_checklist_entries  # type: ignore
+from merge import merge_field  # type: ignore
+from sharding import HashRing  # type: ignore
 from logging_conf import get_logger  # type: ignore
+import metrics  # type: ignore
 
 logger = get_logger("manager")
 
 ONLINE_TIMEOUT = 15
 CLEANUP_TIMEOUT = 300
+# Upper bound for expiry_loop's sleep, so deadlines scheduled while it
+# sleeps fire at most this late
+EXPIRY_MAX_SLEEP = 1.0
 
 REDIS_KEY_PREFIX = "ls:"
+# Dirty leitstellen are written at most this often; it is also the most
+# state a crash can lose. 0 writes through on every commit.
+DEFAULT_PERSIST_INTERVAL_MS = 1000
+
+# A leitstelle is stored as the hash ``ls:{admin_code}``; each field holds
+# the JSON of the listed model attributes so an endpoint only rewrites what
+# it touched. Chat lives in capped lists ``chat:{admin_code}:{vehicle}``.
+META_FIELD = "meta"
+PERSIST_FIELDS: Dict[str, Set[str]] = {
+    META_FIELD: {
+        "name", "vehicle_code", "staffelfuehrer_code", "used_scenarios", "enr_counter", "chat_seq",
+        "revision", "vehicle_revisions", "notices_revision",
+    },
+    "connections": {"connections"},
+    "notes": {"notes"},
+    "sf_notes": {"sf_notes"},
+    "notices": {"notices"},
+    "active_scenarios": {"active_scenarios"},
+    "checklist_states": {"checklist_states"},
+}
+REVISION_ATTRS = {"revision", "vehicle_revisions", "notices_revision"}
+CHAT_VEHICLES_FIELD = "chat_vehicles"
+# Counter for chat seqs in multi-worker mode, so workers never hand out the same one
+CHAT_SEQ_FIELD = "chat_seq"
+# Incremented by every write; a mismatch means another process wrote meanwhile
+VERSION_FIELD = "version"
+WRITE_RETRIES = 5
+CHAT_KEY_PREFIX = "chat:"
+# Optional archive of every chat message: stream ``chat_archive:{admin_code}``
+# capped (approximately) at ``chat_archive_maxlen`` entries
+CHAT_ARCHIVE_PREFIX = "chat_archive:"
+# Hash mapping vehicle/SF codes to admin codes, used by lazy restore
+CODE_INDEX_KEY = "ls_codes"
+
+# Multi-worker mode: every write is announced on ``ls_events:{admin_code}``
+EVENT_CHANNEL_PREFIX = "ls_events:"
+SYNC_RETRY_DELAY = 1.0
+
+RESTORE_BATCH = 500
+RESTORE_WORKERS = 4
+
+# In-memory working set; evicted leitstellen stay in Redis and are faulted
+# back in on their next request. Eviction only happens with Redis.
+DEFAULT_MAX_IN_MEMORY = 500
+DEFAULT_IDLE_EVICT_SECONDS = 3600
+
+# Sharded mode: each worker holds the lease ``workers:{worker_id}`` (value:
+# its URL) and owns the admin codes the hash ring maps to it.
+LEASE_KEY_PREFIX = "workers:"
+DEFAULT_LEASE_TTL_MS = 10000
+
+
+def chat_key(admin_code: str, vehicle_name: str) -> str:
+    return f"{CHAT_KEY_PREFIX}{admin_code}:{vehicle_name}"
+
+
+def chat_archive_key(admin_code: str) -> str:
+    return f"{CHAT_ARCHIVE_PREFIX}{admin_code}"
+
+
+class ChecklistIndex:
+    """Checklist keys of an active scenario with a cursor to the first unchecked entry.
+
+    Built once per generated scenario. The cursor only moves forward while
+    entries are checked and is rewound when an entry before it is unchecked,
+    so finding the next todo is amortized O(1) instead of a full rescan.
+    """
+
+    __slots__ = ("scenario", "keys", "actors", "positions", "cursor")
+
+    def __init__(self, scenario: dict):
+        entries = index_checklist_entries(scenario.get("generated_entries", []))
+        keyed = [e for e in entries if e.get("key") is not None]
+        self.scenario = scenario
+        self.keys = [e["key"] for e in keyed]
+        self.actors = [e.get("actor") for e in keyed]
+        self.positions = {k: i for i, k in enumerate(self.keys)}
+        self.cursor = 0
+
+    def first_unchecked(self, checked: Dict[str, bool]) -> Optional[int]:
+        while self.cursor < len(self.keys) and checked.get(self.keys[self.cursor]):
+            self.cursor += 1
+        return self.cursor if self.cursor < len(self.keys) else None
+
+    def rewind(self, old_checked: Dict[str, bool], new_checked: Dict[str, bool]):
+        for key, value in old_checked.items():
+            if value and not new_checked.get(key):
+                pos = self.positions.get(key)
+                if pos is not None and pos < self.cursor:
+                    self.cursor = pos
+
+
+class ExpiryQueue:
+    """Min-heap of connection deadlines keyed by ``(admin_code, role, name)``.
+
+    A key has at most one live deadline; scheduling an earlier one
+    supersedes it and the old heap entry is skipped when popped. Heartbeats
+    do not touch the heap: a popped key whose connection was renewed is
+    simply scheduled again, so the work is O(expired) plus one push per
+    connection and timeout period.
+    """
+
+    __slots__ = ("_heap", "_scheduled")
+
+    def __init__(self):
+        self._heap: List[Tuple[float, Tuple[str, str, str]]] = []
+        self._scheduled: Dict[Tuple[str, str, str], float] = {}
+
+    def __len__(self):
+        return len(self._scheduled)
+
+    def schedule(self, key: Tuple[str, str, str], deadline: float):
+        current = self._scheduled.get(key)
+        if current is not None and current <= deadline:
+            return
+        self._scheduled[key] = deadline
+        heapq.heappush(self._heap, (deadline, key))
+
+    def pop_due(self, now: float) -> List[Tuple[str, str, str]]:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, key = heapq.heappop(self._heap)
+            if self._scheduled.get(key) == deadline:
+                del self._scheduled[key]
+                due.append(key)
+        return due
+
+    def next_deadline(self) -> Optional[float]:
+        return self._heap[0][0] if self._heap else None
 
 
 class ConnectionManager:
     def __init__(self):
         self.leitstellen: Dict[str, LeitstelleData] = {}
         self.code_to_admin: Dict[str, str] = {}
+        self.subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        # Vehicles the expiry queue found offline; everyone else is online
+        self._offline: Dict[str, Set[str]] = {}
+        self._expiry = ExpiryQueue()
+        self._vehicle_cache: Dict[str, Dict[str, Tuple[int, VehicleStatus]]] = {}
+        self._payload_cache: Dict[str, Tuple[int, Dict[Optional[int], Tuple[str, bytes]]]] = {}
+        self._checklists: Dict[str, Dict[str, ChecklistIndex]] = {}
         self._redis = None
+        self._dirty: Dict[str, Set[str]] = {}
+        self._pending_chat: Dict[str, Dict[str, List[ChatMessage]]] = {}
+        self.persist_interval_ms = DEFAULT_PERSIST_INTERVAL_MS
+        self.chat_history_limit = CHAT_HISTORY_LIMIT
+        self.chat_archive_maxlen = 0
+        self.lazy_load = False
+        self._last_access: "OrderedDict[str, float]" = OrderedDict()
+        self.max_in_memory = DEFAULT_MAX_IN_MEMORY
+        self.idle_evict_seconds = DEFAULT_IDLE_EVICT_SECONDS
+        self.worker_id = uuid.uuid4().hex
+        self.sync_enabled = False
+        self._sync_task: Optional[asyncio.Task] = None
+        self.shard_url: Optional[str] = None
+        self.lease_ttl_ms = DEFAULT_LEASE_TTL_MS
+        self._ring: Optional[HashRing] = None
+        self._lease_task: Optional[asyncio.Task] = None
+        self._pending_heartbeats: Dict[str, Dict[Tuple[str, str], float]] = {}
+        self._seen_revisions: Dict[str, Dict[str, int]] = {}
+        # Stored hash version and field values as last read or written
+        self._versions: Dict[str, int] = {}
+        self._bases: Dict[str, Dict[str, str]] = {}
 
     # ------------------------------------------------------------------
     # Redis persistence
     # ------------------------------------------------------------------
 
-    async def init_redis(self, redis_url: str):
+    async def init_redis(self, redis_url: str, lazy: bool = False):
         import redis.asyncio as aioredis
         try:
             self._redis = aioredis.from_url(redis_url, decode_responses=True)
             await self._redis.ping()
             logger.info(f"Connected to Redis at {redis_url}")
-            await self._load_all()
+            # Lazy restore needs the code index; the first eager load writes it.
+            self.lazy_load = lazy and bool(await self._redis.exists(CODE_INDEX_KEY))
+            if self.lazy_load:
+                logger.info("Lazy restore enabled, leitstellen are loaded on first access")
+            else:
+                await self._load_all()
         except Exception as e:
             logger.error(f"Redis unavailable ({e}), running in-memory only")
             self._redis = None
 
+    def register(self, admin_code: str, ls: LeitstelleData, stored: Optional[Dict[str, str]] = None):
+        """Add a leitstelle to the working set; ``stored`` are its hash fields if loaded from Redis."""
+        ls.set_chat_limit(self.chat_history_limit)
+        self.leitstellen[admin_code] = ls
+        self.code_to_admin[ls.vehicle_code] = admin_code
+        self.code_to_admin[ls.staffelfuehrer_code] = admin_code
+        self._seen_revisions[admin_code] = dict(ls.vehicle_revisions)
+        self.track_all(admin_code)
+        if stored is not None:
+            self._versions[admin_code] = int(stored.get(VERSION_FIELD, 0))
+            self._bases[admin_code] = {name: stored[name] for name in PERSIST_FIELDS if name in stored}
+        self.touch(admin_code)
+
     async def _load_all(self):
+        """Restore every stored leitstelle.
+
+        Keys are fetched in pipelined batches while earlier batches are
+        validated in a bounded thread pool.
+        """
         if not self._redis:
             return
-        cursor = 0
-        while True:
-            cursor, keys = await self._redis.scan(cursor=cursor, match=f"{REDIS_KEY_PREFIX}*", count=100)
-            for key in keys:
-                try:
-                    data = await self._redis.get(key)
-                    if not data:
-                        continue
-                    admin_code = key.removeprefix(REDIS_KEY_PREFIX) if isinstance(key, str) else key.decode().removeprefix(REDIS_KEY_PREFIX)
-                    ls = LeitstelleData.model_validate_json(data)
-                    self.leitstellen[admin_code] = ls
-                    self.code_to_admin[ls.vehicle_code] = admin_code
-                    self.code_to_admin[ls.staffelfuehrer_code] = admin_code
-                except Exception as e:
-                    logger.error(f"Failed to load {key} from Redis: {e}")
-            if cursor == 0:
-                break
+        loop = asyncio.get_running_loop()
+        pending = []
+        with ThreadPoolExecutor(max_workers=RESTORE_WORKERS) as pool:
+            cursor = 0
+            while True:
+                cursor, keys = await self._redis.scan(cursor=cursor, match=f"{REDIS_KEY_PREFIX}*", count=RESTORE_BATCH)
+                admin_codes = [
+                    (key if isinstance(key, str) else key.decode()).removeprefix(REDIS_KEY_PREFIX) for key in keys
+                ]
+                raw, legacy = await self._fetch_raw(admin_codes)
+                for admin_code, fields, chats in raw:
+                    pending.append((admin_code, fields, loop.run_in_executor(pool, self._assemble, fields, chats)))
+                for admin_code in legacy:
+                    pending.append((admin_code, None, asyncio.ensure_future(self._migrate_legacy(admin_code))))
+                if cursor == 0:
+                    break
+            results = await asyncio.gather(*(f for _, _, f in pending), return_exceptions=True)
+
+        index = {}
+        for (admin_code, fields, _), ls in zip(pending, results):
+            if isinstance(ls, BaseException):
+                logger.error(f"Failed to load {REDIS_KEY_PREFIX}{admin_code} from Redis: {ls}")
+                continue
+            self.register(admin_code, ls, fields)
+            index[ls.vehicle_code] = index[ls.staffelfuehrer_code] = admin_code
+        if index:
+            # Backfill the code index used by lazy restore
+            await self._redis.hset(CODE_INDEX_KEY, mapping=index)
         if self.leitstellen:
             logger.info(f"Restored {len(self.leitstellen)} leitstelle(n) from Redis")
 
-    async def persist(self, admin_code: str):
+    async def _fetch_raw(self, admin_codes: List[str]):
+        """Fetch hash fields and chat lists of several leitstellen in a few round trips.
+
+        Returns ``(admin_code, fields, chats)`` tuples plus the admin codes
+        still stored in the legacy single-key format.
+        """
+        if not admin_codes:
+            return [], []
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for admin_code in admin_codes:
+                pipe.type(f"{REDIS_KEY_PREFIX}{admin_code}")
+            kinds = await pipe.execute()
+        hashes = [a for a, kind in zip(admin_codes, kinds) if kind == "hash"]
+        legacy = [a for a, kind in zip(admin_codes, kinds) if kind == "string"]
+        if not hashes:
+            return [], legacy
+
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for admin_code in hashes:
+                pipe.hgetall(f"{REDIS_KEY_PREFIX}{admin_code}")
+            all_fields = await pipe.execute()
+
+        chat_vehicles = [json.loads(fields.get(CHAT_VEHICLES_FIELD, "[]")) for fields in all_fields]
+        histories = iter(())
+        if any(chat_vehicles):
+            async with self._redis.pipeline(transaction=False) as pipe:
+                for admin_code, vehicles in zip(hashes, chat_vehicles):
+                    for vehicle in vehicles:
+                        pipe.lrange(chat_key(admin_code, vehicle), -self.chat_history_limit, -1)
+                histories = iter(await pipe.execute())
+
+        raw = [
+            (admin_code, fields, {vehicle: next(histories) for vehicle in vehicles})
+            for admin_code, fields, vehicles in zip(hashes, all_fields, chat_vehicles)
+        ]
+        return raw, legacy
+
+    @staticmethod
+    def _assemble(fields: Dict[str, str], chats: Dict[str, List[str]]) -> LeitstelleData:
+        data: dict = {}
+        for name in PERSIST_FIELDS:
+            if name in fields:
+                data.update(json.loads(fields[name]))
+        if chats:
+            data["chat_history"] = {
+                vehicle: [json.loads(m) for m in messages] for vehicle, messages in chats.items()
+            }
+        return LeitstelleData.model_validate(data)
+
+    async def _load_leitstelle(self, admin_code: str) -> Optional[Tuple[LeitstelleData, Optional[Dict[str, str]]]]:
+        """Load one leitstelle; returns it with its stored hash fields (None after a migration)."""
+        raw, legacy = await self._fetch_raw([admin_code])
+        if legacy:
+            return await self._migrate_legacy(admin_code), None
+        if not raw:
+            return None
+        _, fields, chats = raw[0]
+        return self._assemble(fields, chats), fields
+
+    async def ensure_loaded(self, code: str) -> Optional[str]:
+        """Resolve a code, faulting its leitstelle in from Redis if it is not in memory.
+
+        Covers lazy restore as well as leitstellen evicted by ``evict_idle``.
+        """
+        admin_code = self.resolve_admin_code(code)
+        if admin_code:
+            self.touch(admin_code)
+            return admin_code
         if not self._redis:
+            return None
+        upper = code.upper()
+        try:
+            admin_code = await self._redis.hget(CODE_INDEX_KEY, upper) or upper
+            if not self.owns(admin_code):
+                return None
+            loaded = await self._load_leitstelle(admin_code)
+        except Exception as e:
+            logger.error(f"Failed to load {upper} from Redis: {e}")
+            return None
+        if not loaded:
+            return None
+        # A concurrent request may have loaded it while we were waiting
+        if admin_code not in self.leitstellen:
+            self.register(admin_code, *loaded)
+        return admin_code
+
+    async def _migrate_legacy(self, admin_code: str) -> LeitstelleData:
+        """Convert a single-key JSON leitstelle into the hash + chat list layout."""
+        raw = await self._redis.get(f"{REDIS_KEY_PREFIX}{admin_code}")
+        ls = LeitstelleData.model_validate_json(raw)
+        chat = {vehicle: list(history) for vehicle, history in ls.chat_history.items()}
+        await self._write(admin_code, ls, set(PERSIST_FIELDS), chat, replace=True)
+        logger.info(f"Migrated {admin_code} to per-field persistence")
+        return ls
+
+    async def _write(self, admin_code: str, ls: LeitstelleData, fields: Set[str],
+                     chat: Dict[str, List[ChatMessage]], replace: bool = False):
+        """Write fields and chat as one versioned transaction.
+
+        The hash is WATCHed and its version compared with the one we last
+        saw. If another process wrote in between, the stored fields are
+        merged into ``ls`` first and the transaction is retried on a race.
+        """
+        from redis.exceptions import WatchError
+
+        key = f"{REDIS_KEY_PREFIX}{admin_code}"
+        limit = self.chat_history_limit
+        for _ in range(WRITE_RETRIES):
+            reconciled = False
+            async with self._redis.pipeline(transaction=True) as pipe:
+                try:
+                    await pipe.watch(key)
+                    stored_version, stored_chat = 0, None
+                    if not replace:
+                        stored_version, stored_chat = await pipe.hmget(key, [VERSION_FIELD, CHAT_VEHICLES_FIELD])
+                        stored_version = int(stored_version or 0)
+                        if stored_version != self._versions.get(admin_code, 0):
+                            # Every field another process changed, not only ours: the
+                            # version below marks all of them as seen
+                            names = sorted(PERSIST_FIELDS)
+                            bases = self._bases.get(admin_code, {})
+                            stored = {name: value for name, value in zip(names, await pipe.hmget(key, names))
+                                      if value is not None and value != bases.get(name)}
+                            self._reconcile(admin_code, ls, stored)
+                            reconciled = True
+
+                    mapping = {name: ls.model_dump_json(include=PERSIST_FIELDS[name]) for name in fields}
+                    mapping[VERSION_FIELD] = stored_version + 1
+                    if chat:
+                        vehicles = json.loads(stored_chat or "[]")
+                        mapping[CHAT_VEHICLES_FIELD] = json.dumps(vehicles + [v for v in ls.chat_history if v not in vehicles])
+
+                    pipe.multi()
+                    if replace:
+                        pipe.delete(key)
+                    pipe.hset(key, mapping=mapping)
+                    if self.sync_enabled:
+                        pipe.publish(f"{EVENT_CHANNEL_PREFIX}{admin_code}", json.dumps({
+                            "worker": self.worker_id,
+                            "fields": sorted(fields),
+                            "chat": {v: [m.model_dump_json() for m in msgs[-limit:]] for v, msgs in chat.items()},
+                        }))
+                    if fields >= PERSIST_FIELDS.keys():
+                        pipe.hset(CODE_INDEX_KEY, mapping={ls.vehicle_code: admin_code, ls.staffelfuehrer_code: admin_code})
+                    for vehicle, messages in chat.items():
+                        if not messages:
+                            continue
+                        ckey = chat_key(admin_code, vehicle)
+                        if replace:
+                            pipe.delete(ckey)
+                        pipe.rpush(ckey, *(m.model_dump_json() for m in messages[-limit:]))
+                        pipe.ltrim(ckey, -limit, -1)
+                        if self.chat_archive_maxlen and not replace:
+                            for m in messages:
+                                pipe.xadd(chat_archive_key(admin_code), {"vehicle": vehicle, "message": m.model_dump_json()},
+                                          maxlen=self.chat_archive_maxlen, approximate=True)
+                    await pipe.execute()
+                except WatchError:
+                    continue
+
+            metrics.PERSIST_BYTES.observe(sum(len(v) for v in mapping.values() if isinstance(v, str)))
+            self._versions[admin_code] = stored_version + 1
+            bases = self._bases.setdefault(admin_code, {})
+            for name in fields:
+                bases[name] = mapping[name]
+            if reconciled:
+                # Push the merged-in changes to our own subscribers
+                self.notify(admin_code)
             return
+        raise RuntimeError(f"gave up after {WRITE_RETRIES} conflicting writes")
+
+    def _reconcile(self, admin_code: str, ls: LeitstelleData, stored: Dict[str, Optional[str]]):
+        """Three-way merge stored hash fields into ``ls``.
+
+        The base is the field as last read or written by this process, so
+        local changes that were not written yet survive. Revisions are
+        numbered per process; vehicles whose stored revision moved are
+        bumped locally so this process's delta clients pick them up.
+        """
+        bases = self._bases.setdefault(admin_code, {})
+        data = {"name": ls.name, "vehicle_code": ls.vehicle_code, "staffelfuehrer_code": ls.staffelfuehrer_code}
+        names = [name for name, value in stored.items() if value is not None and name in PERSIST_FIELDS]
+        for name in names:
+            ours = json.loads(ls.model_dump_json(include=PERSIST_FIELDS[name]))
+            base = json.loads(bases.get(name, "{}"))
+            data.update(merge_field(base, ours, json.loads(stored[name])))
+            bases[name] = stored[name]
+        if not names:
+            return
+        merged = LeitstelleData.model_validate(data)
+        old_checklists = ls.checklist_states
+        ls.update_from(merged, {attr for name in names for attr in PERSIST_FIELDS[name]} - REVISION_ATTRS)
+        if "connections" in names:
+            self.track_all(admin_code)
+        if "checklist_states" in names:
+            # The cursor of an index only knows about local changes
+            indexes = self._checklists.get(admin_code, {})
+            for vehicle in set(old_checklists) | set(ls.checklist_states):
+                if old_checklists.get(vehicle) != ls.checklist_states.get(vehicle):
+                    indexes.pop(vehicle, None)
+
+        changed = []
+        if META_FIELD in names:
+            remote = json.loads(stored[META_FIELD])
+            remote_revisions = remote.get("vehicle_revisions", {})
+            seen = self._seen_revisions.get(admin_code, {})
+            changed = [n for n, r in remote_revisions.items() if seen.get(n) != r]
+            self._seen_revisions[admin_code] = dict(remote_revisions)
+            ls.revision = max(ls.revision, remote.get("revision", 0))
+        ls.bump(*changed, notices="notices" in names)
+
+    async def persist(self, admin_code: str, fields: Set[str], chat: Dict[str, List[ChatMessage]]) -> bool:
+        """Write the given hash fields and append pending chat messages."""
+        if not self._redis:
+            return True
+        start = time.perf_counter()
         try:
             ls = self.leitstellen.get(admin_code)
             if ls:
-                await self._redis.set(
-                    f"{REDIS_KEY_PREFIX}{admin_code}",
-                    ls.model_dump_json(exclude={"scenarios"}),
-                )
+                await self._write(admin_code, ls, fields, chat)
             else:
-                await self._redis.delete(f"{REDIS_KEY_PREFIX}{admin_code}")
+                # Evicted or handed over meanwhile; whatever was dirty is gone with it
+                logger.warning(f"Not persisting {admin_code}: no longer in memory")
+            return True
         except Exception as e:
             logger.error(f"Failed to persist {admin_code}: {e}")
+            metrics.PERSIST_FAILURES.inc()
+            return False
+        finally:
+            metrics.PERSIST_SECONDS.observe(time.perf_counter() - start)
+
+    async def mark_dirty(self, admin_code: str, fields=()):
+        """Schedule a write of ``fields`` (all of them if empty).
+
+        The meta field always goes along because every commit bumps the
+        revision. With a zero interval the write happens right away.
+        """
+        if not self._redis:
+            return
+        dirty = self._dirty.setdefault(admin_code, {META_FIELD})
+        dirty.update(fields or PERSIST_FIELDS)
+        if self.persist_interval_ms <= 0:
+            await self._flush_one(admin_code)
+
+    async def append_chat(self, admin_code: str, vehicle_name: str, message: ChatMessage):
+        ls = self.leitstellen[admin_code]
+        if self.sync_enabled and not message.seq:
+            message.seq = await self._next_chat_seq(admin_code, ls)
+        ls.append_chat(vehicle_name, message)
+        if self._redis:
+            self._pending_chat.setdefault(admin_code, {}).setdefault(vehicle_name, []).append(message)
+
+    async def _next_chat_seq(self, admin_code: str, ls: LeitstelleData) -> int:
+        """Allocate a chat seq shared by all workers (0 falls back to a local one).
+
+        The counter lives next to the persisted fields; if it is behind the
+        loaded state (new field, or the key was rewritten) it is moved past
+        ``chat_seq`` first.
+        """
+        key = f"{REDIS_KEY_PREFIX}{admin_code}"
+        try:
+            seq = await self._redis.hincrby(key, CHAT_SEQ_FIELD, 1)
+            if seq <= ls.chat_seq:
+                seq = await self._redis.hincrby(key, CHAT_SEQ_FIELD, ls.chat_seq - seq + 1)
+            return seq
+        except Exception as e:
+            logger.error(f"Failed to allocate chat seq for {admin_code}: {e}")
+            return 0
+
+    async def _flush_one(self, admin_code: str):
+        fields = self._dirty.pop(admin_code, set())
+        chat = self._pending_chat.pop(admin_code, {})
+        written = False
+        try:
+            written = await self.persist(admin_code, fields, chat)
+        finally:
+            if not written:
+                # Requeue in front of anything that arrived meanwhile.
+                self._dirty.setdefault(admin_code, set()).update(fields)
+                pending = self._pending_chat.setdefault(admin_code, {})
+                for vehicle, messages in chat.items():
+                    pending[vehicle] = messages + pending.get(vehicle, [])
+
+    async def flush(self):
+        """Write every dirty leitstelle once. Failed writes stay dirty."""
+        for admin_code in list(self._dirty):
+            await self._flush_one(admin_code)
+        await self._publish_heartbeats()
+
+    async def persist_loop(self):
+        # With write-through the loop only publishes heartbeats
+        interval = self.persist_interval_ms if self.persist_interval_ms > 0 else DEFAULT_PERSIST_INTERVAL_MS
+        while True:
+            await asyncio.sleep(interval / 1000)
+            await self.flush()
 
     async def close(self):
+        await self.flush()
+        if self._lease_task:
+            self._lease_task.cancel()
+            await asyncio.gather(self._lease_task, return_exceptions=True)
+            self._lease_task = None
+            # Let the other workers take over our shards right away
+            try:
+                await self._redis.delete(f"{LEASE_KEY_PREFIX}{self.worker_id}")
+            except Exception as e:
+                logger.error(f"Failed to release worker lease: {e}")
+        if self._sync_task:
+            self._sync_task.cancel()
+            await asyncio.gather(self._sync_task, return_exceptions=True)
+            self._sync_task = None
         if self._redis:
             await self._redis.aclose()
 
+    # ------------------------------------------------------------------
+    # Multi-worker sync
+    # ------------------------------------------------------------------
+
+    async def enable_sync(self):
+        """Share state with other workers through Redis pub/sub.
+
+        Writes become write-through so a worker never holds unpublished
+        changes, and every write is announced with the fields it touched.
+        Other workers re-read those fields and push the change to their own
+        WebSocket subscribers. Heartbeats, which are not persisted, are
+        batched and published by the persist loop.
+        """
+        if not self._redis or self._sync_task:
+            return
+        self.persist_interval_ms = 0
+        self.sync_enabled = True
+        self._sync_task = asyncio.create_task(self._sync_listener())
+        logger.info(f"Multi-worker sync enabled (worker {self.worker_id[:8]})")
+
+    def note_heartbeat(self, admin_code: str, connection: Connection):
+        if self.sync_enabled:
+            self._pending_heartbeats.setdefault(admin_code, {})[(connection.role, connection.name)] = connection.last_update
+
+    async def _publish_heartbeats(self):
+        beats, self._pending_heartbeats = self._pending_heartbeats, {}
+        for admin_code, connections in beats.items():
+            try:
+                await self._redis.publish(f"{EVENT_CHANNEL_PREFIX}{admin_code}", json.dumps({
+                    "worker": self.worker_id,
+                    "heartbeats": [[role, name, ts] for (role, name), ts in connections.items()],
+                }))
+            except Exception as e:
+                logger.error(f"Failed to publish heartbeats for {admin_code}: {e}")
+
+    async def _sync_listener(self):
+        while True:
+            pubsub = self._redis.pubsub()
+            try:
+                await pubsub.psubscribe(f"{EVENT_CHANNEL_PREFIX}*")
+                async for message in pubsub.listen():
+                    if message["type"] != "pmessage":
+                        continue
+                    admin_code = message["channel"].removeprefix(EVENT_CHANNEL_PREFIX)
+                    event = json.loads(message["data"])
+                    if event.get("worker") == self.worker_id or admin_code not in self.leitstellen:
+                        continue
+                    try:
+                        await self._apply_remote(admin_code, event)
+                    except Exception as e:
+                        logger.error(f"Failed to apply remote change to {admin_code}: {e}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Sync listener lost Redis ({e}), resubscribing")
+                await asyncio.sleep(SYNC_RETRY_DELAY)
+            finally:
+                await pubsub.aclose()
+
+    async def _apply_remote(self, admin_code: str, event: dict):
+        ls = self.leitstellen[admin_code]
+        revision = ls.revision
+
+        fields = sorted(f for f in event.get("fields", []) if f in PERSIST_FIELDS)
+        if fields:
+            values = await self._redis.hmget(f"{REDIS_KEY_PREFIX}{admin_code}", fields)
+            self._reconcile(admin_code, ls, dict(zip(fields, values)))
+
+        for vehicle, messages in event.get("chat", {}).items():
+            for raw in messages:
+                message = ChatMessage.model_validate_json(raw)
+                message.revision = ls.revision
+                ls.append_chat(vehicle, message)
+
+        for role, name, ts in event.get("heartbeats", []):
+            conn = ls.get_connection(name, role)
+            if conn and ts > conn.last_update:
+                conn.last_update = ts
+
+        self.refresh_online(admin_code)
+        if fields or ls.revision != revision:
+            self.notify(admin_code)
+
+    # ------------------------------------------------------------------
+    # Sharding
+    # ------------------------------------------------------------------
+
+    async def enable_sharding(self, url: str):
+        """Own only the leitstellen the hash ring assigns to this worker.
+
+        Workers announce themselves with a lease that expires unless renewed,
+        so a crashed worker's shards move to the others after
+        ``lease_ttl_ms``. Requests for foreign codes are redirected to
+        ``url`` of the owning worker (see ``owner_url``).
+        """
+        if not self._redis or self._lease_task:
+            return
+        self.shard_url = url.rstrip("/")
+        await self._renew_lease()
+        self._lease_task = asyncio.create_task(self._lease_loop())
+        logger.info(f"Sharding enabled (worker {self.worker_id[:8]} at {self.shard_url})")
+
+    async def _renew_lease(self):
+        await self._redis.set(f"{LEASE_KEY_PREFIX}{self.worker_id}", self.shard_url, px=self.lease_ttl_ms)
+        keys, cursor = [], 0
+        while True:
+            cursor, batch = await self._redis.scan(cursor, match=f"{LEASE_KEY_PREFIX}*", count=100)
+            keys.extend(batch)
+            if not cursor:
+                break
+        urls = await self._redis.mget(keys)
+        members = {k[len(LEASE_KEY_PREFIX):]: u for k, u in zip(keys, urls) if u}
+        if self._ring is None or members != self._ring.nodes:
+            self._ring = HashRing(members)
+            logger.info(f"Shard ring changed: {len(members)} workers")
+        # Also retries hand-overs whose final write failed last time
+        for admin_code in [a for a in self.leitstellen if not self.owns(a)]:
+            await self._release(admin_code)
+
+    async def _lease_loop(self):
+        while True:
+            await asyncio.sleep(self.lease_ttl_ms / 3000)
+            try:
+                await self._renew_lease()
+            except Exception as e:
+                logger.error(f"Failed to renew worker lease: {e}")
+
+    def owns(self, admin_code: str) -> bool:
+        if self._ring is None:
+            return True
+        return self._ring.node_for(admin_code) in (self.worker_id, None)
+
+    async def owner_url(self, code: str) -> Optional[str]:
+        """URL of the worker owning ``code``, or None if it is ours (or unknown)."""
+        if self._ring is None:
+            return None
+        upper = code.upper()
+        admin_code = self.resolve_admin_code(upper)
+        if not admin_code and self._redis:
+            try:
+                admin_code = await self._redis.hget(CODE_INDEX_KEY, upper)
+            except Exception as e:
+                logger.error(f"Failed to resolve owner of {upper}: {e}")
+                return None
+        admin_code = admin_code or upper
+        if self.owns(admin_code):
+            return None
+        return self._ring.nodes[self._ring.node_for(admin_code)]
+
+    async def _release(self, admin_code: str):
+        """Hand a leitstelle over to its new owner.
+
+        Pending writes are flushed first; if that fails the leitstelle stays
+        in memory and dirty, and the next lease renewal tries again. Open
+        WebSockets are woken up and, finding the leitstelle gone, close so the
+        client reconnects to the owner.
+        """
+        if admin_code in self._dirty or admin_code in self._pending_chat:
+            await self._flush_one(admin_code)
+            if admin_code in self._dirty or admin_code in self._pending_chat:
+                logger.warning(f"Keeping {admin_code} until its pending writes succeed")
+                return
+        subs = self.subscribers.pop(admin_code, set())
+        self._forget(admin_code)
+        for queue in subs:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(0)
+
+    # ------------------------------------------------------------------
+    # Subscribers (WebSocket push)
+    # ------------------------------------------------------------------
+
+    def subscribe(self, admin_code: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        self.subscribers.setdefault(admin_code, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, admin_code: str, queue: asyncio.Queue):
+        subs = self.subscribers.get(admin_code)
+        if subs is None:
+            return
+        subs.discard(queue)
+        if not subs:
+            del self.subscribers[admin_code]
+
+    def notify(self, admin_code: str):
+        """Wake every subscriber of a leitstelle.
+
+        Each queue holds at most one pending revision, so a slow client only
+        ever gets one delta covering everything it missed.
+        """
+        subs = self.subscribers.get(admin_code)
+        if not subs:
+            return
+        revision = self.leitstellen[admin_code].revision
+        for queue in subs:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(revision)
+
+    async def commit(self, admin_code: str, *fields: str):
+        """Mark the touched persist fields dirty and push the change to subscribers.
+
+        Without ``fields`` the whole leitstelle is written.
+        """
+        if admin_code not in self.leitstellen:
+            # Released or evicted meanwhile; the state lives on in Redis
+            return
+        self.refresh_online(admin_code)
+        await self.mark_dirty(admin_code, fields)
+        self.notify(admin_code)
+
     # ------------------------------------------------------------------
     # Lookups
     # ------------------------------------------------------------------
@@ -87,114 +804,392 @@ class ConnectionManager:
 
     def get_leitstelle(self, code: str) -> Optional[Tuple[str, LeitstelleData]]:
         admin_code = self.resolve_admin_code(code)
-        if not admin_code:
+        if not admin_code or not self.owns(admin_code):
             return None
         return admin_code, self.leitstellen[admin_code]
 
-    def find_connection(self, ls: LeitstelleData, name: str) -> Optional[Connection]:
-        return next((c for c in ls.connections if c.name == name), None)
+    def find_connection(self, ls: LeitstelleData, name: str, role: str = ROLE_VEHICLE) -> Optional[Connection]:
+        return ls.get_connection(name, role)
 
     def is_online(self, connection: Connection) -> bool:
         return (time.time() - connection.last_update) < ONLINE_TIMEOUT
 
+    def is_offline(self, admin_code: str, name: str) -> bool:
+        """Whether the expiry queue marked the vehicle offline (as shown on the board)."""
+        return name in self._offline.get(admin_code, ())
+
     # ------------------------------------------------------------------
     # Status building
     # ------------------------------------------------------------------
 
+    def refresh_online(self, admin_code: str) -> bool:
+        """Bring vehicles back online whose ``last_update`` was refreshed.
+
+        Runs on every commit. Only the vehicles currently offline are
+        checked; going offline is detected by the expiry queue.
+        """
+        offline = self._offline.get(admin_code)
+        ls = self.leitstellen.get(admin_code)
+        if not offline or not ls:
+            return False
+        now = time.time()
+        revived = []
+        for name in list(offline):
+            conn = ls.get_connection(name)
+            if conn is None:
+                offline.discard(name)
+            elif (now - conn.last_update) < ONLINE_TIMEOUT:
+                offline.discard(name)
+                self.track(admin_code, conn, now)
+                revived.append(name)
+        if revived:
+            ls.bump(*revived)
+        return bool(revived)
+
+    @staticmethod
+    def _operator_channel(ls: LeitstelleData, name: Optional[str], role: str) -> Optional[str]:
+        operator = ls.get_connection(name, role) if name else None
+        return operator.radio_channel if operator else None
+
+    def _build_vehicle_status(self, admin_code: str, ls: LeitstelleData, c: Connection, now: float) -> VehicleStatus:
+        # All values come from validated state, so skip validation
+        return VehicleStatus.model_construct(
+            name=c.name,
+            status=c.status,
+            special=c.special,
+            kurzstatus=c.kurzstatus,
+            last_update=c.last_update,
+            last_status_update=c.last_status_update,
+            last_blitz_update=c.last_blitz_update,
+            last_sprechwunsch_update=c.last_sprechwunsch_update,
+            is_staffelfuehrer=c.is_staffelfuehrer,
+            note=ls.notes.get(c.name, ""),
+            sf_note=ls.sf_notes.get(c.name, ""),
+            is_online=c.name not in self._offline.get(admin_code, ()),
+            talking_to_sf=c.talking_to_sf,
+            talking_to_sf_since=c.talking_to_sf_since,
+            radio_channel=c.radio_channel,
+            claimed_by=c.claimed_by,
+            ls_claimed_by=c.ls_claimed_by,
+            ls_radio_channel=self._operator_channel(ls, c.ls_claimed_by, ROLE_LS),
+            sf_radio_channel=self._operator_channel(ls, c.claimed_by, ROLE_SF),
+            active_scenario=ls.active_scenarios.get(c.name),
+            checklist_state=ls.checklist_states.get(c.name),
+            next_todo=self._compute_next_todo(admin_code, ls, c.name),
+            last_activity=c.last_activity,
+            revision=ls.vehicle_revisions.get(c.name, 0),
+        )
+
+    def _vehicle_statuses(self, admin_code: str, ls: LeitstelleData, since: int = -1) -> Tuple[list, list]:
+        """Return (vehicles changed after ``since``, all vehicle names).
+
+        VehicleStatus objects are cached per vehicle revision, so only vehicles
+        that were bumped get rebuilt. ``last_update`` in a cached entry is the
+        heartbeat seen at build time; ``is_online`` flips bump the revision.
+        """
+        cache = self._vehicle_cache.setdefault(admin_code, {})
+        now = time.time()
+        vehicles = []
+        names = []
+        for c in ls.vehicles():
+            names.append(c.name)
+            revision = ls.vehicle_revisions.get(c.name, 0)
+            if revision <= since:
+                continue
+            cached = cache.get(c.name)
+            if cached is None or cached[0] != revision:
+                cached = (revision, self._build_vehicle_status(admin_code, ls, c, now))
+                cache[c.name] = cached
+            vehicles.append(cached[1])
+        return vehicles, names
+
     def build_status_update(self, admin_code: str) -> Optional[StatusUpdate]:
         if admin_code not in self.leitstellen:
             return None
 
         ls = self.leitstellen[admin_code]
-        now = time.time()
-        vehicles = []
+        vehicles, _ = self._vehicle_statuses(admin_code, ls)
+        return StatusUpdate(revision=ls.revision, connections=vehicles, notices=ls.notices)
 
-        # Build lookup for LS/SF channels by operator name
-        ls_channels = {c.name: c.radio_channel for c in ls.connections if c.is_leitstelle and c.radio_channel}
-        sf_channels = {c.name: c.radio_channel for c in ls.connections if c.is_staffelfuehrer and c.radio_channel}
+    def build_status_delta(self, admin_code: str, since: int) -> Optional[StatusUpdate | StatusDelta | StatusUnchanged]:
+        """Return what changed after revision ``since``.
 
-        for c in ls.connections:
-            if c.is_staffelfuehrer or c.is_leitstelle:
-                continue
+        Falls back to a full update if ``since`` is ahead of the server (e.g.
+        after a restart without Redis).
+        """
+        if admin_code not in self.leitstellen:
+            return None
+
+        ls = self.leitstellen[admin_code]
+        if since == ls.revision:
+            return StatusUnchanged(revision=ls.revision)
+        if since > ls.revision or since < 0:
+            return self.build_status_update(admin_code)
+
+        vehicles, names = self._vehicle_statuses(admin_code, ls, since)
+        return StatusDelta(
+            revision=ls.revision,
+            connections=vehicles,
+            names=names,
+            notices=ls.notices if ls.notices_revision > since else None,
+        )
+
+    def status_json(self, admin_code: str, since: Optional[int] = None) -> Optional[Tuple[str, bytes]]:
+        """``(type, serialized JSON)`` of the full update (``since`` is None) or delta.
+
+        Every poller of a leitstelle at the same revision gets the same bytes.
+        They are cached per leitstelle and keyed by ``(revision, since)``;
+        any ``ls.bump()`` moves the revision and thereby invalidates them.
+        """
+        ls = self.leitstellen.get(admin_code)
+        if not ls:
+            return None
+
+        revision, payloads = self._payload_cache.get(admin_code, (None, None))
+        if revision != ls.revision:
+            payloads = {}
+            self._payload_cache[admin_code] = (ls.revision, payloads)
+
+        entry = payloads.get(since)
+        if entry is None:
+            start = time.perf_counter()
+            update = self.build_status_update(admin_code) if since is None else self.build_status_delta(admin_code, since)
+            metrics.STATUS_BUILD_SECONDS.observe(time.perf_counter() - start, update.type)
+            body = to_json(update)
+            metrics.STATUS_PAYLOAD_BYTES.observe(len(body), update.type)
+            entry = payloads[since] = (update.type, body)
+        return entry
+
+    def checklist_index(self, admin_code: str, vehicle_name: str) -> Optional[ChecklistIndex]:
+        """Index of the vehicle's active scenario, rebuilt only when a new one was started."""
+        ls = self.leitstellen.get(admin_code)
+        indexes = self._checklists.setdefault(admin_code, {})
+        scenario = ls.active_scenarios.get(vehicle_name) if ls else None
+        if not scenario:
+            indexes.pop(vehicle_name, None)
+            return None
+        index = indexes.get(vehicle_name)
+        if index is None or index.scenario is not scenario:
+            index = ChecklistIndex(scenario)
+            indexes[vehicle_name] = index
+        return index
 
-            vehicles.append(VehicleStatus(
-                name=c.name,
-                status=c.status,
-                special=c.special,
-                kurzstatus=c.kurzstatus,
-                last_update=c.last_update,
-                last_status_update=c.last_status_update,
-                last_blitz_update=c.last_blitz_update,
-                last_sprechwunsch_update=c.last_sprechwunsch_update,
-                is_staffelfuehrer=c.is_staffelfuehrer,
-                note=ls.notes.get(c.name, ""),
-                sf_note=ls.sf_notes.get(c.name, ""),
-                is_online=(now - c.last_update) < ONLINE_TIMEOUT,
-                talking_to_sf=c.talking_to_sf,
-                talking_to_sf_since=c.talking_to_sf_since,
-                radio_channel=c.radio_channel,
-                claimed_by=c.claimed_by,
-                ls_claimed_by=c.ls_claimed_by,
-                ls_radio_channel=ls_channels.get(c.ls_claimed_by or ""),
-                sf_radio_channel=sf_channels.get(c.claimed_by or ""),
-                active_scenario=ls.active_scenarios.get(c.name),
-                checklist_state=ls.checklist_states.get(c.name),
-                next_todo=self._compute_next_todo(ls, c.name),
-                last_activity=c.last_activity,
-            ))
-
-        return StatusUpdate(connections=vehicles, notices=ls.notices)
-
-    def _compute_next_todo(self, ls: LeitstelleData, vehicle_name: str) -> Optional[str]:
-        active_scen = ls.active_scenarios.get(vehicle_name)
+    def update_checklist(self, admin_code: str, vehicle_name: str, old_checked: Dict[str, bool],
+                         new_checked: Dict[str, bool]):
+        index = self._checklists.get(admin_code, {}).get(vehicle_name)
+        if index:
+            index.rewind(old_checked, new_checked)
+
+    def _compute_next_todo(self, admin_code: str, ls: LeitstelleData, vehicle_name: str) -> Optional[str]:
         checklist = ls.checklist_states.get(vehicle_name)
-        if not active_scen or not checklist:
+        if not checklist:
+            return None
+        index = self.checklist_index(admin_code, vehicle_name)
+        if not index:
             return None
 
-        entries = active_scen.get("generated_entries", [])
-        checked = checklist.checked_entries
+        pos = index.first_unchecked(checklist.checked_entries)
+        if pos is not None and index.actors[pos] in ("LS", "SF"):
+            return index.actors[pos]
+        return None
 
-        for i, entry in enumerate(entries):
-            msg = entry.get("message", "")
-            if not msg.startswith("[[E"):
-                continue
+    # ------------------------------------------------------------------
+    # Metrics
+    # ------------------------------------------------------------------
+
+    async def collect_metrics(self):
+        """Fill in the gauges describing the in-memory state; called per scrape."""
+        metrics.LEITSTELLEN.set(len(self.leitstellen))
+        now = time.time()
+        # (role, state) -> clients; the expiry queue only tracks vehicles, so
+        # SF and LS connections are checked against ONLINE_TIMEOUT here
+        clients = {(role, state): 0 for role in (ROLE_VEHICLE, ROLE_SF, ROLE_LS) for state in ("online", "offline")}
+        chat = scenarios = entries = 0
+        for admin_code, ls in self.leitstellen.items():
+            gone = len(self._offline.get(admin_code, ()))
+            clients[ROLE_VEHICLE, "online"] += len(ls.vehicles()) - gone
+            clients[ROLE_VEHICLE, "offline"] += gone
+            for role in (ROLE_SF, ROLE_LS):
+                for conn in ls.operators(role):
+                    clients[role, "online" if now - conn.last_update < ONLINE_TIMEOUT else "offline"] += 1
+            chat += sum(len(messages) for messages in ls.chat_history.values())
+            scenarios += len(ls.active_scenarios)
+            entries += sum(len(s.get("generated_entries", ())) for s in ls.active_scenarios.values())
+        for (role, state), count in clients.items():
+            metrics.CLIENTS.set(count, role, state)
+        metrics.CHAT_MESSAGES.set(chat)
+        metrics.ACTIVE_SCENARIOS.set(scenarios)
+        metrics.SCENARIO_ENTRIES.set(entries)
+
+        metrics.REDIS_RTT.clear()
+        if self._redis:
+            start = time.perf_counter()
+            try:
+                await self._redis.ping()
+                metrics.REDIS_RTT.set(time.perf_counter() - start)
+            except Exception as e:
+                logger.warning(f"Redis ping failed: {e}")
+
+    # ------------------------------------------------------------------
+    # Working set
+    # ------------------------------------------------------------------
+
+    def touch(self, admin_code: str):
+        self._last_access[admin_code] = time.time()
+        self._last_access.move_to_end(admin_code)
 
-            end_e = msg.find("]]", 3)
-            e_part = msg[3:end_e]
-            s_start = msg.find("[[S", end_e)
-            end_s = msg.find("]]", s_start + 3)
-            s_part = msg[s_start + 3:end_s]
+    def _in_use(self, admin_code: str, now: float) -> bool:
+        if self.subscribers.get(admin_code):
+            return True
+        ls = self.leitstellen[admin_code]
+        return any((now - c.last_update) < ONLINE_TIMEOUT for c in ls.connections)
 
-            prefix = msg[:end_s + 2]
-            f_idx = sum(1 for prev in entries[:i] if prev.get("message", "").startswith(prefix))
+    async def evict_idle(self):
+        """Drop least recently used leitstellen from memory.
 
-            key = f"{e_part}-{s_part}-{f_idx}"
-            if not checked.get(key):
-                actor = entry.get("actor")
-                if actor in ("LS", "SF"):
-                    return actor
+        Entries idle for longer than ``idle_evict_seconds`` go first, then
+        the oldest ones until at most ``max_in_memory`` remain. Leitstellen
+        with subscribers or online connections are kept. Pending writes are
+        flushed before an entry is dropped.
+        """
+        if not self._redis:
+            return
+        now = time.time()
+        for admin_code in self.leitstellen:
+            self._last_access.setdefault(admin_code, now)
+        excess = len(self.leitstellen) - self.max_in_memory
+        evicted = 0
+        for admin_code, last_access in list(self._last_access.items()):
+            idle = now - last_access >= self.idle_evict_seconds
+            if not idle and evicted >= excess:
                 break
+            if admin_code not in self.leitstellen or self._in_use(admin_code, now):
+                continue
+            if admin_code in self._dirty:
+                await self._flush_one(admin_code)
+                # Failed, or mutated again while we were writing
+                if admin_code in self._dirty:
+                    continue
+                # A request may have touched or subscribed to it meanwhile
+                if (admin_code not in self.leitstellen or self._last_access.get(admin_code) != last_access
+                        or self._in_use(admin_code, time.time())):
+                    continue
+            self._forget(admin_code)
+            evicted += 1
+        if evicted:
+            logger.info(f"Evicted {evicted} idle leitstelle(n) from memory")
 
-        return None
+    def _forget(self, admin_code: str):
+        ls = self.leitstellen.pop(admin_code)
+        for code in (ls.vehicle_code, ls.staffelfuehrer_code):
+            if self.code_to_admin.get(code) == admin_code:
+                del self.code_to_admin[code]
+        for cache in (self._last_access, self._offline, self._vehicle_cache,
+                      self._payload_cache, self._checklists, self._seen_revisions,
+                      self._versions, self._bases):
+            cache.pop(admin_code, None)
+        metrics.forget_leitstelle(admin_code)
 
     # ------------------------------------------------------------------
-    # Cleanup
+    # Expiry and cleanup
     # ------------------------------------------------------------------
 
+    def track(self, admin_code: str, conn: Connection, now: Optional[float] = None):
+        """Schedule the next expiry check of a connection.
+
+        Online connections are due at ``ONLINE_TIMEOUT`` after their last
+        heartbeat, offline ones at ``CLEANUP_TIMEOUT``. A vehicle that is
+        already silent for ``ONLINE_TIMEOUT`` (restored or faulted in) is
+        marked offline right away.
+        """
+        idle = (now or time.time()) - conn.last_update
+        if idle < ONLINE_TIMEOUT:
+            timeout = ONLINE_TIMEOUT
+        else:
+            timeout = CLEANUP_TIMEOUT
+            if conn.role == ROLE_VEHICLE:
+                offline = self._offline.setdefault(admin_code, set())
+                if conn.name not in offline:
+                    offline.add(conn.name)
+                    self.leitstellen[admin_code].bump(conn.name)
+        self._expiry.schedule((admin_code, conn.role, conn.name), conn.last_update + timeout)
+
+    def track_all(self, admin_code: str):
+        now = time.time()
+        for conn in self.leitstellen[admin_code].connections:
+            self.track(admin_code, conn, now)
+
+    def add_connection(self, admin_code: str, conn: Connection):
+        self.leitstellen[admin_code].add_connection(conn)
+        self.track(admin_code, conn)
+
+    async def expire_due(self, now: Optional[float] = None):
+        """Handle the connections whose deadline passed.
+
+        Vehicles that went silent for ``ONLINE_TIMEOUT`` are marked offline
+        and pushed to subscribers; connections silent for
+        ``CLEANUP_TIMEOUT`` are removed.
+        """
+        now = now or time.time()
+        changed: Dict[str, List[str]] = {}
+        stale: Dict[str, Set[int]] = {}
+        for admin_code, role, name in self._expiry.pop_due(now):
+            ls = self.leitstellen.get(admin_code)
+            conn = ls.get_connection(name, role) if ls else None
+            if conn is None or not self.owns(admin_code):
+                continue
+            idle = now - conn.last_update
+            if idle >= CLEANUP_TIMEOUT:
+                stale.setdefault(admin_code, set()).add(id(conn))
+                continue
+            if role == ROLE_VEHICLE:
+                offline = self._offline.setdefault(admin_code, set())
+                if (idle >= ONLINE_TIMEOUT) != (name in offline):
+                    offline.symmetric_difference_update((name,))
+                    changed.setdefault(admin_code, []).append(name)
+            self.track(admin_code, conn, now)
+
+        for admin_code, names in changed.items():
+            self.leitstellen[admin_code].bump(*names)
+            if admin_code not in stale:
+                self.notify(admin_code)
+        for admin_code, ids in stale.items():
+            await self._remove_connections(admin_code, lambda c: id(c) in ids)
+
+    async def expiry_loop(self):
+        while True:
+            deadline = self._expiry.next_deadline()
+            delay = EXPIRY_MAX_SLEEP if deadline is None else deadline - time.time()
+            await asyncio.sleep(min(max(delay, 0), EXPIRY_MAX_SLEEP))
+            await self.expire_due()
+
     async def cleanup_inactive(self):
+        """Full sweep for stale connections; the expiry queue normally does this."""
         now = time.time()
-        for admin_code in list(self.leitstellen.keys()):
-            ls = self.leitstellen[admin_code]
-            original = len(ls.connections)
-
-            ls.connections = [c for c in ls.connections if (now - c.last_update) < CLEANUP_TIMEOUT]
-
-            removed = original - len(ls.connections)
-            if removed:
-                logger.info(f"Cleaned up {removed} inactive connections in {admin_code}")
-                active_names = {c.name for c in ls.connections}
-                ls.notices = {n: v for n, v in ls.notices.items() if n in active_names}
-                await self.persist(admin_code)
+        for admin_code in [a for a in self.leitstellen if self.owns(a)]:
+            await self._remove_connections(admin_code, lambda c: (now - c.last_update) >= CLEANUP_TIMEOUT)
+
+    async def _remove_connections(self, admin_code: str, predicate):
+        ls = self.leitstellen[admin_code]
+        removed = ls.remove_connections(predicate)
+        if not removed:
+            return
+        stale_names = {c.name for c in removed}
+        logger.info(f"Cleaned up {len(removed)} inactive connections in {admin_code}")
+        active_names = {c.name for c in ls.connections}
+        ls.notices = {n: v for n, v in ls.notices.items() if n in active_names}
+        ls.vehicle_revisions = {n: r for n, r in ls.vehicle_revisions.items() if n in active_names}
+        self._offline.get(admin_code, set()).intersection_update(active_names)
+        per_vehicle_state = (
+            self._vehicle_cache.get(admin_code, {}),
+            self._checklists.get(admin_code, {}),
+        )
+        for per_vehicle in per_vehicle_state:
+            for name in [n for n in per_vehicle if n not in active_names]:
+                del per_vehicle[name]
+        # Vehicles claimed by a removed operator lose its radio channel.
+        ls.bump(*ls.claimed_vehicles(claimed_by=stale_names, ls_claimed_by=stale_names), notices=True)
+        await self.commit(admin_code, "connections", "notices")
 
 
 manager = ConnectionManager()
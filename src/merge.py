@@ -0,0 +1,71 @@
+"""Three-way merge of persisted leitstelle fields.
+
+Used when a write finds that another process changed the same hash field
+since we last read it. ``base`` is the field as we last saw it in Redis,
+``ours`` the local state and ``theirs`` the current stored value; all are
+the decoded JSON objects written by ``PERSIST_FIELDS``.
+
+Keys only one side changed take that side's value. If both sides changed
+the same key, ours wins, except for timestamps and counters (max) and
+scenario lists (union). Connections are merged per connection and
+attribute, so a status change and a claim on the same vehicle both survive.
+"""
+
+from typing import Any
+
+_MISSING = object()
+
+# Attributes where the larger value wins when both sides changed
+MAX_ATTRS = {"last_update", "last_activity", "enr_counter", "chat_seq"}
+
+
+def _pick(base: Any, ours: Any, theirs: Any, key: str = "") -> Any:
+    if ours == base:
+        return theirs
+    if theirs == base or theirs == ours:
+        return ours
+    if key in MAX_ATTRS and ours is not _MISSING and theirs is not _MISSING:
+        return max(ours, theirs)
+    if isinstance(ours, list) and isinstance(theirs, list):
+        return ours + [v for v in theirs if v not in ours]
+    return ours
+
+
+def _merge_keys(base: dict, ours: dict, theirs: dict, nested: bool = False) -> dict:
+    merged = {}
+    for key in list(ours) + [k for k in theirs if k not in ours]:
+        b = base.get(key, _MISSING)
+        o = ours.get(key, _MISSING)
+        t = theirs.get(key, _MISSING)
+        if nested and all(isinstance(v, dict) for v in (b, o, t)):
+            value = _merge_keys(b, o, t)
+        else:
+            value = _pick(b, o, t, key)
+        if value is not _MISSING:
+            merged[key] = value
+    # Keys deleted by one side and untouched by the other stay deleted
+    return merged
+
+
+def _connection_key(c: dict) -> str:
+    return f"{int(c.get('is_staffelfuehrer', False))}{int(c.get('is_leitstelle', False))}:{c['name']}"
+
+
+def _merge_connections(base: list, ours: list, theirs: list) -> list:
+    keyed = [{_connection_key(c): c for c in side} for side in (base, ours, theirs)]
+    return list(_merge_keys(*keyed, nested=True).values())
+
+
+def merge_field(base: dict, ours: dict, theirs: dict) -> dict:
+    merged = {}
+    for attr in ours:
+        b, o, t = base.get(attr, _MISSING), ours[attr], theirs.get(attr, _MISSING)
+        if t is _MISSING:
+            merged[attr] = o
+        elif attr == "connections":
+            merged[attr] = _merge_connections(b if b is not _MISSING else [], o, t)
+        elif isinstance(o, dict) and isinstance(t, dict):
+            merged[attr] = _merge_keys(b if isinstance(b, dict) else {}, o, t)
+        else:
+            merged[attr] = _pick(b, o, t, attr)
+    return merged
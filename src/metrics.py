@@ -0,0 +1,175 @@
+"""Prometheus metrics in the text exposition format.
+
+Metrics are only touched from the event loop thread, so updates are plain
+list/attribute writes without locks. A histogram allocates its bucket
+counts once per label set; observing is a bisect and two additions.
+Gauges describing the in-memory state are filled in when ``/metrics`` is
+scraped instead of being maintained on every request.
+"""
+
+import bisect
+import hashlib
+import hmac
+import secrets
+import time
+from typing import Dict, List, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_registry: List["_Metric"] = []
+
+# Admin codes are credentials and /metrics is unauthenticated, so series are
+# labelled with a keyed hash of the code instead. The key is per process.
+_ID_KEY = secrets.token_bytes(16)
+_ids: Dict[str, str] = {}
+
+
+def leitstelle_id(admin_code: str) -> str:
+    """Stable, non-reversible label for a leitstelle within this process."""
+    label = _ids.get(admin_code)
+    if label is None:
+        label = _ids[admin_code] = hmac.new(_ID_KEY, admin_code.encode(), hashlib.sha256).hexdigest()[:12]
+    return label
+
+
+def forget_leitstelle(admin_code: str):
+    label = _ids.pop(admin_code, None)
+    if label is not None:
+        POLLS.remove(label)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._series: Dict[Tuple[str, ...], object] = {}
+        _registry.append(self)
+
+    def remove(self, *label_values: str):
+        self._series.pop(label_values, None)
+
+    def clear(self):
+        self._series.clear()
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{_labels(self.labels, k)} {v}" for k, v in self._series.items()]
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self._samples()]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        if not labels:
+            self._series[()] = 0
+
+    def inc(self, *label_values: str, amount: float = 1):
+        self._series[label_values] = self._series.get(label_values, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, *label_values: str):
+        self._series[label_values] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float], labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        if not labels:
+            self._series[()] = [0] * (len(self.buckets) + 1) + [0.0]
+
+    def observe(self, value: float, *label_values: str):
+        series = self._series.get(label_values)
+        if series is None:
+            # One count per bucket plus +Inf, then the sum
+            series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, series in self._series.items():
+            total = 0
+            for bound, count in zip((*self.buckets, "+Inf"), series):
+                total += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labels, key, le)} {total}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {series[-1]}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {total}")
+        return lines
+
+
+def render() -> str:
+    return "\n".join(line for metric in _registry for line in metric.render()) + "\n"
+
+
+# --- Hot paths ---------------------------------------------------------
+
+REQUEST_SECONDS = Histogram("status_sim_http_request_duration_seconds", "HTTP request latency by route",
+                            LATENCY_BUCKETS, ("method", "route"))
+POLLS = Counter("status_sim_polls_total", "Status polls per leitstelle", ("leitstelle",))
+STATUS_BUILD_SECONDS = Histogram("status_sim_status_build_seconds", "Time to build a status update or delta",
+                                 LATENCY_BUCKETS, ("type",))
+STATUS_PAYLOAD_BYTES = Histogram("status_sim_status_payload_bytes", "Serialized status update or delta size",
+                                 SIZE_BUCKETS, ("type",))
+PERSIST_SECONDS = Histogram("status_sim_persist_duration_seconds", "Time to write a leitstelle to Redis",
+                            LATENCY_BUCKETS)
+PERSIST_BYTES = Histogram("status_sim_persist_bytes", "Hash field bytes per Redis write", SIZE_BUCKETS)
+PERSIST_FAILURES = Counter("status_sim_persist_failures_total", "Failed Redis writes")
+EVENT_LOOP_LAG = Histogram("status_sim_event_loop_lag_seconds", "How late the loop watchdog woke up",
+                           LATENCY_BUCKETS)
+EVENT_LOOP_STALLS = Counter("status_sim_event_loop_stalls_total",
+                            "Callbacks that blocked the event loop longer than the watchdog threshold")
+
+# --- Filled in on scrape ------------------------------------------------
+
+REDIS_RTT = Gauge("status_sim_redis_rtt_seconds", "Round trip of a Redis PING")
+LEITSTELLEN = Gauge("status_sim_leitstellen", "Leitstellen held in memory")
+CLIENTS = Gauge("status_sim_clients", "Connected clients by role", ("role", "state"))
+CHAT_MESSAGES = Gauge("status_sim_chat_messages", "Chat messages held in memory")
+ACTIVE_SCENARIOS = Gauge("status_sim_active_scenarios", "Scenarios running on a vehicle")
+SCENARIO_ENTRIES = Gauge("status_sim_scenario_entries", "Generated checklist entries of running scenarios")
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency per route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            # Set by the router on the shared scope; keeps codes out of the labels
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_SECONDS.observe(time.perf_counter() - start, scope["method"], route)
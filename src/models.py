@@ -1,7 +1,19 @@
+import heapq
 import random
+from collections import deque
+from dataclasses import dataclass
 
-from pydantic import BaseModel, Field
-from typing import List, Dict, Optional
+from pydantic import BaseModel, Field, PrivateAttr
+from typing import Callable, Deque, Iterable, List, Dict, Optional
+
+ROLE_VEHICLE = "vehicle"
+ROLE_SF = "sf"
+ROLE_LS = "ls"
+
+# Default capacity of each chat's in-memory ring buffer and Redis list
+CHAT_HISTORY_LIMIT = 200
+# Chat channel holding messages to all vehicles; merged into each vehicle's chat on read
+BROADCAST_CHANNEL = "*"
 
 
 # --- Request models ---
@@ -79,15 +91,27 @@ class ChatMessage(BaseModel):
     sender: str
     text: str
     timestamp: float
+    revision: int = 0
+    # Increasing across all chats of a leitstelle (broadcasts included);
+    # clients pass the last seen one as ``after`` to only receive newer messages
+    seq: int = 0
+
 
+@dataclass(slots=True)
+class Connection:
+    """Hot per-client state, mutated on every heartbeat.
 
-class Connection(BaseModel):
+    A slotted dataclass instead of a model: no per-instance ``__dict__`` and
+    plain attribute writes. Pydantic validates and serializes it as part of
+    ``LeitstelleData``, so the JSON form is unchanged.
+    """
     name: str
+    last_update: float
+    last_status_update: float
+    last_activity: float
     status: str = "2"
     special: Optional[str] = None
     kurzstatus: Optional[str] = None
-    last_update: float
-    last_status_update: float
     last_blitz_update: Optional[float] = None
     last_sprechwunsch_update: Optional[float] = None
     is_staffelfuehrer: bool = False
@@ -97,7 +121,14 @@ class Connection(BaseModel):
     radio_channel: Optional[str] = None
     claimed_by: Optional[str] = None
     ls_claimed_by: Optional[str] = None
-    last_activity: float
+
+    @property
+    def role(self) -> str:
+        if self.is_staffelfuehrer:
+            return ROLE_SF
+        if self.is_leitstelle:
+            return ROLE_LS
+        return ROLE_VEHICLE
 
 
 class VehicleStatus(BaseModel):
@@ -124,14 +155,35 @@ class VehicleStatus(BaseModel):
     checklist_state: Optional[ChecklistState] = None
     next_todo: Optional[str] = None
     last_activity: float
+    revision: int = 0
 
 
 class StatusUpdate(BaseModel):
     type: str = "status_update"
+    revision: int = 0
     connections: List[VehicleStatus]
     notices: Dict[str, Notice]
 
 
+class StatusDelta(BaseModel):
+    """Changes since a client's last seen revision.
+
+    ``connections`` only holds vehicles that changed, ``names`` lists every
+    current vehicle so clients can drop removed ones. ``notices`` is omitted
+    when unchanged.
+    """
+    type: str = "status_delta"
+    revision: int
+    connections: List[VehicleStatus]
+    names: List[str]
+    notices: Optional[Dict[str, Notice]] = None
+
+
+class StatusUnchanged(BaseModel):
+    type: str = "unchanged"
+    revision: int
+
+
 class LeitstelleData(BaseModel):
     name: str
     vehicle_code: str
@@ -140,13 +192,138 @@ class LeitstelleData(BaseModel):
     notices: Dict[str, Notice] = Field(default_factory=dict)
     notes: Dict[str, str] = Field(default_factory=dict)
     sf_notes: Dict[str, str] = Field(default_factory=dict)
-    chat_history: Dict[str, List[ChatMessage]] = Field(default_factory=dict)
+    # Ring buffers (deque with maxlen): appending to a full one drops the oldest message
+    chat_history: Dict[str, Deque[ChatMessage]] = Field(default_factory=dict)
     active_scenarios: Dict[str, dict] = Field(default_factory=dict)
     checklist_states: Dict[str, ChecklistState] = Field(default_factory=dict)
-    scenarios: Dict[str, dict] = Field(default_factory=dict)
     used_scenarios: Dict[str, List[str]] = Field(default_factory=dict)
     enr_counter: int = 1
+    chat_seq: int = 0
+    revision: int = 0
+    vehicle_revisions: Dict[str, int] = Field(default_factory=dict)
+    notices_revision: int = 0
+
+    # role -> name -> connection, kept in sync with ``connections``
+    _index: Dict[str, Dict[str, Connection]] = PrivateAttr(default_factory=dict)
+    _chat_limit: int = PrivateAttr(default=CHAT_HISTORY_LIMIT)
+
+    def model_post_init(self, __context) -> None:
+        self._reindex()
+        self.set_chat_limit(self._chat_limit)
+        # Histories stored before messages had sequence numbers
+        for history in self.chat_history.values():
+            if history and not history[-1].seq:
+                for i, message in enumerate(history, 1):
+                    message.seq = i
+            if history:
+                self.chat_seq = max(self.chat_seq, history[-1].seq)
+
+    def _reindex(self):
+        self._index = {ROLE_VEHICLE: {}, ROLE_SF: {}, ROLE_LS: {}}
+        for c in self.connections:
+            self._index[c.role][c.name] = c
+
+    # ``connections`` stays the serialized form; mutate it only through these
+    # methods so the index stays in sync.
+
+    def get_connection(self, name: str, role: str = ROLE_VEHICLE) -> Optional[Connection]:
+        return self._index[role].get(name)
+
+    def vehicles(self) -> Iterable[Connection]:
+        return self._index[ROLE_VEHICLE].values()
+
+    def operators(self, role: str) -> Iterable[Connection]:
+        return self._index[role].values()
+
+    def add_connection(self, connection: Connection):
+        self.connections.append(connection)
+        self._index[connection.role][connection.name] = connection
+
+    def rename_connection(self, connection: Connection, name: str):
+        by_name = self._index[connection.role]
+        if by_name.get(connection.name) is connection:
+            del by_name[connection.name]
+        connection.name = name
+        by_name[name] = connection
+
+    def remove_connections(self, predicate: Callable[[Connection], bool]) -> List[Connection]:
+        kept: List[Connection] = []
+        removed: List[Connection] = []
+        for c in self.connections:
+            (removed if predicate(c) else kept).append(c)
+        if removed:
+            self.connections = kept
+            self._reindex()
+        return removed
+
+    def set_chat_limit(self, limit: int):
+        self._chat_limit = limit
+        for vehicle_name, history in self.chat_history.items():
+            if history.maxlen != limit:
+                self.chat_history[vehicle_name] = deque(history, maxlen=limit)
+
+    def append_chat(self, vehicle_name: str, message: ChatMessage):
+        """Append to a vehicle's chat; messages from other workers keep their ``seq``."""
+        history = self.chat_history.get(vehicle_name)
+        if history is None:
+            history = self.chat_history[vehicle_name] = deque(maxlen=self._chat_limit)
+        if message.seq:
+            self.chat_seq = max(self.chat_seq, message.seq)
+        else:
+            self.chat_seq += 1
+            message.seq = self.chat_seq
+        history.append(message)
+        # Another worker's message can arrive after a later local one;
+        # chat_after relies on the history being ordered by seq.
+        if len(history) > 1 and history[-2].seq > message.seq:
+            ordered = sorted(history, key=lambda m: m.seq)
+            history.clear()
+            history.extend(ordered)
+
+    def chat_after(self, vehicle_name: str, after: int) -> List[ChatMessage]:
+        """Messages with ``seq > after``, found by scanning back from the newest."""
+        newer = []
+        for message in reversed(self.chat_history.get(vehicle_name, ())):
+            if message.seq <= after:
+                break
+            newer.append(message)
+        newer.reverse()
+        return newer
+
+    def chat_for(self, vehicle_name: str, after: int = 0) -> List[ChatMessage]:
+        """A vehicle's chat with the broadcasts merged in by timestamp."""
+        own = self.chat_after(vehicle_name, after)
+        shared = self.chat_after(BROADCAST_CHANNEL, after)
+        if not shared:
+            return own
+        if not own:
+            return shared
+        merged = list(heapq.merge(own, shared, key=lambda m: (m.timestamp, m.seq)))
+        return merged[-self._chat_limit:]
+
+    def update_from(self, other: "LeitstelleData", attrs: Iterable[str]):
+        """Take over the given attributes of another instance (remote changes)."""
+        for attr in attrs:
+            setattr(self, attr, getattr(other, attr))
+        if "connections" in attrs:
+            self._reindex()
 
     def next_enr(self) -> str:
         self.enr_counter += random.randint(5, 15)
         return str(self.enr_counter)
+
+    def claimed_vehicles(self, claimed_by=(), ls_claimed_by=()) -> List[str]:
+        """Names of vehicles claimed by one of the given SF or LS operators."""
+        return [
+            c.name for c in self.vehicles()
+            if c.claimed_by in claimed_by or c.ls_claimed_by in ls_claimed_by
+        ]
+
+    def bump(self, *vehicle_names: str, notices: bool = False) -> int:
+        """Advance the revision and mark the given vehicles/notices as changed."""
+        self.revision += 1
+        for name in vehicle_names:
+            self.vehicle_revisions[name] = self.revision
+        if notices:
+            self.notices_revision = self.revision
+        return self.revision
@@ -0,0 +1,216 @@
+"""Sampling profiler and event-loop lag measurement for production diagnosis.
+
+The profiler samples the event loop thread's stack from a timer thread
+(``sys._current_frames``), so the loop itself does no extra work per call.
+Stacks are aggregated in the collapsed format (``frame;frame;frame count``)
+understood by flamegraph.pl, speedscope and inferno.
+
+Lag is measured by a task that sleeps a fixed interval and records how
+much later than requested it woke up; a slow ``model_dump_json`` or a
+blocking call shows up there as well as in the profile. ``LoopWatchdog``
+does so continuously and captures the stack of callbacks that block the
+loop for longer than a threshold.
+"""
+
+import asyncio
+import hmac
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from typing import Deque, Dict, Optional, Tuple
+
+import metrics  # type: ignore
+from logging_conf import get_logger  # type: ignore
+
+logger = get_logger("profiler")
+
+DEFAULT_SAMPLE_INTERVAL = 0.005
+# Upper bound for one profiling window, so a forgotten request cannot keep sampling
+MAX_PROFILE_SECONDS = 60
+DEFAULT_LAG_INTERVAL = 0.1
+LAG_SAMPLES = 600
+# The watchdog reports callbacks blocking the loop longer than this
+DEFAULT_STALL_THRESHOLD = 0.1
+STALL_HISTORY = 20
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+class SamplingProfiler:
+    """Collects collapsed stacks of one thread until stopped."""
+
+    def __init__(self, interval: float = DEFAULT_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._target: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, thread_id: Optional[int] = None):
+        """Sample ``thread_id``, by default the calling (event loop) thread."""
+        self._target = thread_id or threading.get_ident()
+        self.stacks.clear()
+        self.samples = 0
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            if frame is None:
+                return
+            names = []
+            while frame is not None:
+                names.append(_frame_name(frame))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(names))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes up from ``asyncio.sleep``."""
+
+    def __init__(self, interval: float = DEFAULT_LAG_INTERVAL, maxlen: Optional[int] = LAG_SAMPLES):
+        self.interval = interval
+        self.lags: Deque[float] = deque(maxlen=maxlen)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.record(max(0.0, loop.time() - start - self.interval))
+
+    def record(self, lag: float):
+        self.lags.append(lag)
+
+    def summary(self) -> Dict[str, float]:
+        """Lag statistics in seconds over the retained samples."""
+        lags = sorted(self.lags)
+        if not lags:
+            return {"samples": 0}
+        return {
+            "samples": len(lags),
+            "mean": sum(lags) / len(lags),
+            "p50": lags[len(lags) // 2],
+            "p99": lags[min(len(lags) - 1, int(len(lags) * 0.99))],
+            "max": lags[-1],
+        }
+
+
+class ProfilerControl:
+    """Admin switch for one profiling window at a time.
+
+    Disabled unless ``token`` is set (``PROFILER_TOKEN``); requests must
+    present the same token.
+    """
+
+    def __init__(self):
+        self.token: Optional[str] = None
+        self.busy = False
+
+    def allowed(self, token: Optional[str]) -> bool:
+        return bool(self.token) and token is not None and hmac.compare_digest(token, self.token)
+
+    async def profile(self, seconds: float, interval: float = DEFAULT_SAMPLE_INTERVAL) -> dict:
+        """Sample the event loop for ``seconds`` (capped) and measure its lag meanwhile."""
+        seconds = min(max(seconds, 0.0), MAX_PROFILE_SECONDS)
+        self.busy = True
+        sampler = SamplingProfiler(interval)
+        monitor = LoopLagMonitor(interval=min(DEFAULT_LAG_INTERVAL, seconds or DEFAULT_LAG_INTERVAL),
+                                 maxlen=None)
+        lag_task = asyncio.create_task(monitor.run())
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            sampler.stop()
+            lag_task.cancel()
+            await asyncio.gather(lag_task, return_exceptions=True)
+            self.busy = False
+        return {
+            "seconds": time.perf_counter() - start,
+            "samples": sampler.samples,
+            "lag": monitor.summary(),
+            "collapsed": sampler.collapsed(),
+        }
+
+
+class LoopWatchdog:
+    """Continuously measures event-loop lag and reports callbacks that block it.
+
+    A task on the loop beats every ``interval``. A thread watches the beats
+    and, once one is ``threshold`` overdue, captures the loop thread's stack
+    while it is still stuck. The stall is logged and counted when the loop
+    comes back, so metrics are only written from the loop thread.
+    """
+
+    def __init__(self, threshold: float = DEFAULT_STALL_THRESHOLD, interval: float = DEFAULT_LAG_INTERVAL):
+        self.threshold = threshold
+        self.monitor = LoopLagMonitor(interval)
+        self.stalls: Deque[dict] = deque(maxlen=STALL_HISTORY)
+        self._loop_thread: Optional[int] = None
+        # Monotonic time the current beat is due, and the stack captured for it
+        self._due = 0.0
+        self._captured: Optional[Tuple[float, str]] = None
+        self._stop = threading.Event()
+
+    async def run(self):
+        interval = self.monitor.interval
+        self._loop_thread = threading.get_ident()
+        self._due = time.monotonic() + interval
+        self._stop.clear()
+        thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        thread.start()
+        try:
+            while True:
+                due = self._due = time.monotonic() + interval
+                await asyncio.sleep(interval)
+                lag = max(0.0, time.monotonic() - due)
+                self.monitor.record(lag)
+                metrics.EVENT_LOOP_LAG.observe(lag)
+                if lag >= self.threshold:
+                    captured = self._captured
+                    self._report(lag, captured[1] if captured and captured[0] == due else None)
+        finally:
+            self._stop.set()
+            thread.join()
+
+    def _watch(self):
+        check = min(self.threshold, self.monitor.interval) / 2
+        while not self._stop.wait(check):
+            due = self._due
+            if time.monotonic() - due < self.threshold:
+                continue
+            if self._captured and self._captured[0] == due:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is not None:
+                self._captured = (due, "".join(traceback.format_stack(frame)))
+
+    def _report(self, lag: float, stack: Optional[str]):
+        metrics.EVENT_LOOP_STALLS.inc()
+        self.stalls.append({"at": time.time(), "lag": lag, "stack": stack})
+        logger.warning(f"Event loop blocked for {lag * 1000:.0f} ms" + (f", stack:\n{stack}" if stack else ""))
+
+
+profiler = ProfilerControl()
+watchdog = LoopWatchdog()
@@ -0,0 +1,114 @@
+"""Process-wide catalog of the scenario files in ``static/scenarios``.
+
+Each file is read and validated once and shared by all leitstellen, which
+only reference scenarios by name. Files are re-read when their mtime
+changes; the directory is checked at most every ``RELOAD_CHECK_INTERVAL``
+seconds.
+"""
+
+import json
+import os
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+
+from scenario_models import Scenario  # type: ignore
+from logging_conf import get_logger  # type: ignore
+
+logger = get_logger("scenario_catalog")
+
+SCENARIOS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "scenarios")
+RELOAD_CHECK_INTERVAL = 2.0
+
+
+class CatalogEntry:
+    __slots__ = ("name", "beschreibung", "scenario", "error")
+
+    def __init__(self, name: str, beschreibung: str, scenario: Optional[Scenario], error: Optional[str] = None):
+        self.name = name
+        self.beschreibung = beschreibung
+        self.scenario = scenario
+        self.error = error
+
+    def dump(self) -> Optional[dict]:
+        """A fresh ``model_dump()``, safe to extend per start (cheaper than a deep copy)."""
+        return self.scenario.model_dump() if self.scenario else None
+
+
+class ScenarioCatalog:
+    def __init__(self, directory: str = SCENARIOS_DIR):
+        self.directory = directory
+        self._entries: Dict[str, CatalogEntry] = {}
+        # file name -> (mtime, scenario name)
+        self._files: Dict[str, Tuple[float, str]] = {}
+        # file name -> mtime of files that could not be read, logged once per change
+        self._failed: Dict[str, float] = {}
+        self._checked_at = 0.0
+
+    def refresh(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._checked_at < RELOAD_CHECK_INTERVAL:
+            return
+        self._checked_at = now
+        if not os.path.isdir(self.directory):
+            logger.warning(f"Scenarios directory not found: {self.directory}")
+            return
+
+        seen = set()
+        with os.scandir(self.directory) as it:
+            for item in it:
+                if not item.name.endswith(".json"):
+                    continue
+                seen.add(item.name)
+                mtime = item.stat().st_mtime
+                known = self._files.get(item.name)
+                if known and known[0] == mtime or self._failed.get(item.name) == mtime:
+                    continue
+                if known:
+                    self._entries.pop(self._files.pop(item.name)[1], None)
+                entry = self._load(item.path, item.name)
+                if entry:
+                    self._entries[entry.name] = entry
+                    self._files[item.name] = (mtime, entry.name)
+                    self._failed.pop(item.name, None)
+                else:
+                    self._failed[item.name] = mtime
+
+        for fname in [f for f in self._files if f not in seen]:
+            self._entries.pop(self._files.pop(fname)[1], None)
+        for fname in [f for f in self._failed if f not in seen]:
+            del self._failed[fname]
+
+    def _load(self, path: str, fname: str) -> Optional[CatalogEntry]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+        except Exception as e:
+            logger.error(f"Failed to load scenario {fname}: {e}")
+            return None
+        name = raw.get("name") or os.path.splitext(fname)[0]
+        beschreibung = raw.get("beschreibung", "")
+        try:
+            return CatalogEntry(name, beschreibung, Scenario.model_validate(raw))
+        except Exception as e:
+            logger.error(f"Fehler beim Validieren des Szenarios {name}: {e}")
+            return CatalogEntry(name, beschreibung, None, error=str(e))
+
+    def entries(self) -> List[CatalogEntry]:
+        self.refresh()
+        return list(self._entries.values())
+
+    def names(self) -> List[str]:
+        self.refresh()
+        return list(self._entries)
+
+    def get(self, name: str) -> Optional[CatalogEntry]:
+        self.refresh()
+        return self._entries.get(name)
+
+    def random_valid(self) -> Optional[CatalogEntry]:
+        valid = [e for e in self.entries() if e.scenario]
+        return random.choice(valid) if valid else None
+
+
+catalog = ScenarioCatalog()
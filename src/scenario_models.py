@@ -67,6 +67,46 @@ class FunkEntry(BaseModel):
     actor: Literal["LS", "SF", "FZ"]
     message: Optional[str] = None
     status: Optional[str] = None
+    # Checkliste: Einsatz-, Schritt- und laufender Index innerhalb des Schritts.
+    # ``key`` ("E-S-index") ist der Schlüssel in ChecklistState.checked_entries.
+    einsatz: Optional[int] = None
+    schritt: Optional[int] = None
+    index: Optional[int] = None
+    key: Optional[str] = None
+
+    def set_checklist_position(self, einsatz: int, schritt: int, index: int):
+        self.message = f"[[E{einsatz}]][[S{schritt}]]" + (self.message or "")
+        self.einsatz = einsatz
+        self.schritt = schritt
+        self.index = index
+        self.key = f"{einsatz}-{schritt}-{index}"
+
+
+def index_checklist_entries(entries: List[dict]) -> List[dict]:
+    """Ergänzt einsatz/schritt/index/key für Einträge ohne diese Felder.
+
+    Ältere, aus Redis geladene Szenarien kennen nur das ``[[E..]][[S..]]``
+    Präfix in ``message``. Die Einträge werden in-place ergänzt.
+    """
+    counts: Dict[Tuple[str, str], int] = {}
+    for entry in entries:
+        if entry.get("key") is not None:
+            continue
+        msg = entry.get("message") or ""
+        if not msg.startswith("[[E"):
+            continue
+        end_e = msg.find("]]", 3)
+        e_part = msg[3:end_e]
+        s_start = msg.find("[[S", end_e)
+        end_s = msg.find("]]", s_start + 3)
+        s_part = msg[s_start + 3:end_s]
+        f_idx = counts.get((e_part, s_part), 0)
+        counts[(e_part, s_part)] = f_idx + 1
+        entry["einsatz"] = int(e_part)
+        entry["schritt"] = int(s_part)
+        entry["index"] = f_idx
+        entry["key"] = f"{e_part}-{s_part}-{f_idx}"
+    return entries
 
 
 class FunkContext(BaseModel):
@@ -576,11 +616,11 @@ class NachalarmierungSchritt(BaseModel):
     begruendung: str
 
     def generate_entries(self, ctx: FunkContext) -> List[FunkEntry]:
-        last = FunkEntry(actor="LS", message=f"Verstanden, {ctx.ls} <time> Ende."),
+        last = FunkEntry(actor="LS", message=f"Verstanden, {ctx.ls} <time> Ende.")
 
         if self.fahrzeuge:
             fz_liste, fz_names = generate_names(self.fahrzeuge)
-            last = FunkEntry(actor="LS", message=f"Verstanden {fz_liste} unterwegs, {ctx.ls} <time> Ende."),
+            last = FunkEntry(actor="LS", message=f"Verstanden {fz_liste} unterwegs, {ctx.ls} <time> Ende.")
 
         return [
             FunkEntry(actor="SF", message=f"Melder {ctx.fk} von Staffelführer {ctx.fk}, kommen."),
@@ -710,9 +750,8 @@ class Scenario(BaseModel):
             new_activity_types = ["neue_taetigkeit_mit_fzn", "neue_taetigkeit_mit_fzn_status_1", "neue_taetigkeit_ohne_fzn"]
             if last_step_type not in new_activity_types:
                 alarm_entries = einsatz.generate_alarmierung(ctx)
-                for entry in alarm_entries:
-                    prefix = f"[[E{i}]][[S0]]"
-                    entry.message = prefix + (entry.message or "")
+                for f_idx, entry in enumerate(alarm_entries):
+                    entry.set_checklist_position(i, 0, f_idx)
                     result.append(entry)
 
             # Schritte delegiert generieren
@@ -720,10 +759,9 @@ class Scenario(BaseModel):
                 gen = getattr(schritt, "generate_entries", None)
                 if callable(gen):
                     s_entries = gen(ctx)
-                    for entry in s_entries:
+                    for f_idx, entry in enumerate(s_entries):
                         # Schritte fangen bei 1 an, da 0 die Alarmierung ist
-                        prefix = f"[[E{i}]][[S{j + 1}]]"
-                        entry.message = prefix + (entry.message or "")
+                        entry.set_checklist_position(i, j + 1, f_idx)
                         result.append(entry)
                 
                 # Typ des letzten Schritts für den nächsten Einsatz merken
@@ -0,0 +1,32 @@
+"""Consistent hashing of admin codes onto worker processes.
+
+Each worker is placed on the ring ``VNODES`` times so that adding or
+removing one moves only about 1/N of the leitstellen.
+"""
+
+import bisect
+import hashlib
+from typing import Dict, List, Optional, Tuple
+
+VNODES = 64
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    def __init__(self, nodes: Dict[str, str]):
+        """``nodes`` maps worker id to the URL it is reachable at."""
+        self.nodes = dict(nodes)
+        points: List[Tuple[int, str]] = sorted(
+            (_hash(f"{node}#{i}"), node) for node in self.nodes for i in range(VNODES)
+        )
+        self._hashes = [h for h, _ in points]
+        self._owners = [n for _, n in points]
+
+    def node_for(self, key: str) -> Optional[str]:
+        if not self._hashes:
+            return None
+        i = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._owners[i]
@@ -0,0 +1,184 @@
+"""Minimal in-memory stand-in for the redis.asyncio client used by the tests."""
+
+import asyncio
+import fnmatch
+
+from redis.exceptions import WatchError
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.commands = []
+        self.subscriptions = []
+        # key -> number of modifications, for WATCH
+        self.modified = {}
+
+    def _log(self, name, *args):
+        self.commands.append((name,) + args)
+
+    def _touch(self, *keys):
+        for key in keys:
+            self.modified[key] = self.modified.get(key, 0) + 1
+
+    async def ping(self):
+        return True
+
+    async def aclose(self):
+        pass
+
+    async def type(self, key):
+        value = self.data.get(key)
+        if value is None:
+            return "none"
+        return {str: "string", dict: "hash", list: "list"}[type(value)]
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, px=None):
+        self._log("set", key)
+        self._touch(key)
+        self.data[key] = value
+
+    async def mget(self, keys):
+        return [self.data.get(k) for k in keys]
+
+    async def delete(self, *keys):
+        self._log("delete", *keys)
+        self._touch(*keys)
+        for key in keys:
+            self.data.pop(key, None)
+
+    async def hget(self, key, field):
+        return self.data.get(key, {}).get(field)
+
+    async def hmget(self, key, fields):
+        return [self.data.get(key, {}).get(f) for f in fields]
+
+    async def hdel(self, key, *fields):
+        self._touch(key)
+        for field in fields:
+            self.data.get(key, {}).pop(field, None)
+
+    async def exists(self, *keys):
+        return sum(1 for key in keys if key in self.data)
+
+    async def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    async def hset(self, key, mapping):
+        self._log("hset", key, tuple(sorted(mapping)))
+        self._touch(key)
+        if not isinstance(self.data.setdefault(key, {}), dict):
+            raise TypeError("WRONGTYPE")
+        self.data[key].update(mapping)
+
+    async def hincrby(self, key, field, amount=1):
+        self._log("hincrby", key, field)
+        self._touch(key)
+        value = int(self.data.setdefault(key, {}).get(field, 0)) + amount
+        self.data[key][field] = str(value)
+        return value
+
+    async def rpush(self, key, *values):
+        self._log("rpush", key, len(values))
+        self._touch(key)
+        self.data.setdefault(key, []).extend(values)
+
+    async def ltrim(self, key, start, end):
+        self._touch(key)
+        items = self.data.get(key, [])
+        end = len(items) if end == -1 else end + 1
+        self.data[key] = items[start:end] if start >= 0 else items[max(len(items) + start, 0):end]
+
+    async def lrange(self, key, start, end):
+        items = self.data.get(key, [])
+        return items[start:] if end == -1 else items[start:end + 1]
+
+    async def xadd(self, key, fields, maxlen=None, approximate=True):
+        self._log("xadd", key)
+        stream = self.data.setdefault(key, [])
+        stream.append(dict(fields))
+        if maxlen is not None:
+            del stream[:-maxlen]
+
+    async def scan(self, cursor=0, match="*", count=None):
+        return 0, [k for k in self.data if fnmatch.fnmatchcase(k, match)]
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def publish(self, channel, message):
+        receivers = 0
+        for pubsub in self.subscriptions:
+            for pattern in pubsub.patterns:
+                if fnmatch.fnmatchcase(channel, pattern):
+                    pubsub.queue.put_nowait({"type": "pmessage", "pattern": pattern, "channel": channel, "data": message})
+                    receivers += 1
+        return receivers
+
+    def pubsub(self):
+        return FakePubSub(self)
+
+
+class FakePubSub:
+    def __init__(self, redis):
+        self.redis = redis
+        self.patterns = []
+        self.queue = asyncio.Queue()
+
+    async def psubscribe(self, *patterns):
+        self.patterns.extend(patterns)
+        if self not in self.redis.subscriptions:
+            self.redis.subscriptions.append(self)
+
+    async def listen(self):
+        while True:
+            yield await self.queue.get()
+
+    async def aclose(self):
+        if self in self.redis.subscriptions:
+            self.redis.subscriptions.remove(self)
+
+
+class FakePipeline:
+    """Queues commands; after ``watch`` they run immediately until ``multi``."""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.queued = []
+        self.watched = {}
+        self.immediate = False
+
+    async def watch(self, *keys):
+        self.watched.update({k: self.redis.modified.get(k, 0) for k in keys})
+        self.immediate = True
+
+    def multi(self):
+        self.immediate = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        command = getattr(self.redis, name)
+        if self.immediate:
+            return command
+
+        def queue(*args, **kwargs):
+            self.queued.append((command, args, kwargs))
+            return self
+        return queue
+
+    async def execute(self):
+        watched, self.watched = self.watched, {}
+        if any(self.redis.modified.get(k, 0) != v for k, v in watched.items()):
+            self.queued = []
+            raise WatchError("Watched variable changed.")
+        results = [await command(*args, **kwargs) for command, args, kwargs in self.queued]
+        self.queued = []
+        return results
@@ -0,0 +1,156 @@
+import unittest
+import asyncio
+import json
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from manager import ConnectionManager, PERSIST_FIELDS
+from merge import merge_field
+from models import LeitstelleData, Connection, Notice, ChecklistState
+from fake_redis import FakeRedis
+
+
+class TestMergeField(unittest.TestCase):
+    def test_disjoint_changes_are_combined(self):
+        base = {"notes": {"Car1": "a"}}
+        ours = {"notes": {"Car1": "a", "Car2": "b"}}
+        theirs = {"notes": {"Car1": "c"}}
+        self.assertEqual(merge_field(base, ours, theirs), {"notes": {"Car1": "c", "Car2": "b"}})
+
+    def test_deleted_key_stays_deleted(self):
+        base = {"notices": {"Car1": {"text": "x"}, "Car2": {"text": "y"}}}
+        ours = {"notices": {"Car1": {"text": "x"}}}
+        theirs = {"notices": {"Car1": {"text": "x"}, "Car2": {"text": "y"}, "Car3": {"text": "z"}}}
+        self.assertEqual(merge_field(base, ours, theirs)["notices"], {"Car1": {"text": "x"}, "Car3": {"text": "z"}})
+
+    def test_connections_merge_per_attribute(self):
+        base = {"connections": [{"name": "Car1", "status": "2", "claimed_by": None, "last_update": 1}]}
+        ours = {"connections": [{"name": "Car1", "status": "2", "claimed_by": "SF1", "last_update": 5}]}
+        theirs = {"connections": [{"name": "Car1", "status": "3", "claimed_by": None, "last_update": 7}]}
+        merged = merge_field(base, ours, theirs)["connections"]
+        self.assertEqual(merged, [{"name": "Car1", "status": "3", "claimed_by": "SF1", "last_update": 7}])
+
+
+class TestVersionedWrites(unittest.TestCase):
+    """Two managers without pub/sub writing the same leitstelle."""
+
+    def setUp(self):
+        self.redis = FakeRedis()
+
+    def _worker(self):
+        worker = ConnectionManager()
+        worker._redis = self.redis
+        return worker
+
+    async def _setup(self):
+        a, b = self._worker(), self._worker()
+        ls = LeitstelleData(name="Race", vehicle_code="CAR", staffelfuehrer_code="SF")
+        for name in ("Car1", "Car2"):
+            ls.add_connection(Connection(name=name, last_update=1, last_status_update=1, last_activity=1))
+        a.register("ADMIN", ls)
+        await a.persist("ADMIN", set(PERSIST_FIELDS), {})
+        await b.ensure_loaded("CAR")
+        return a, b
+
+    def _stored(self, field):
+        return json.loads(self.redis.data["ls:ADMIN"][field])
+
+    def test_concurrent_edits_are_merged(self):
+        async def run():
+            a, b = await self._setup()
+            ls_a, ls_b = a.leitstellen["ADMIN"], b.leitstellen["ADMIN"]
+
+            ls_a.get_connection("Car1").claimed_by = "SF1"
+            ls_a.notices["Car1"] = Notice(text="Anfordern", status="pending")
+            ls_a.bump("Car1", notices=True)
+            await a.persist("ADMIN", {"meta", "connections", "notices"}, {})
+
+            # B still holds the state from before A's write
+            ls_b.get_connection("Car2").status = "3"
+            ls_b.notices["Car2"] = Notice(text="Sprechwunsch", status="pending")
+            ls_b.bump("Car2", notices=True)
+            await b.persist("ADMIN", {"meta", "connections", "notices"}, {})
+            return ls_b
+
+        ls_b = asyncio.run(run())
+        conns = {c["name"]: c for c in self._stored("connections")["connections"]}
+        self.assertEqual(conns["Car1"]["claimed_by"], "SF1")
+        self.assertEqual(conns["Car2"]["status"], "3")
+        self.assertEqual(sorted(self._stored("notices")["notices"]), ["Car1", "Car2"])
+        self.assertEqual(self.redis.data["ls:ADMIN"]["version"], 3)
+        # B picked up A's change locally as well
+        self.assertEqual(ls_b.get_connection("Car1").claimed_by, "SF1")
+        self.assertEqual(ls_b.vehicle_revisions["Car1"], ls_b.revision)
+
+    def test_write_racing_transaction_is_retried(self):
+        async def run():
+            a, b = await self._setup()
+            hmget = self.redis.hmget
+            raced = []
+
+            async def racing_hmget(key, fields):
+                # A writes between B's WATCH and B's EXEC, once
+                if not raced:
+                    raced.append(True)
+                    a.leitstellen["ADMIN"].notes["Car1"] = "von A"
+                    await a.persist("ADMIN", {"meta", "notes"}, {})
+                return await hmget(key, fields)
+            self.redis.hmget = racing_hmget
+
+            b.leitstellen["ADMIN"].notes["Car2"] = "von B"
+            self.assertTrue(await b.persist("ADMIN", {"meta", "notes"}, {}))
+
+        asyncio.run(run())
+        self.assertEqual(self._stored("notes")["notes"], {"Car1": "von A", "Car2": "von B"})
+        self.assertEqual(self.redis.data["ls:ADMIN"]["version"], 3)
+
+    def test_remote_change_to_unwritten_field_is_kept(self):
+        async def run():
+            a, b = await self._setup()
+            ls_a, ls_b = a.leitstellen["ADMIN"], b.leitstellen["ADMIN"]
+
+            ls_b.notes["Car1"] = "from B"
+            await b.persist("ADMIN", {"notes"}, {})
+            # A's version check sees B's write while writing another field
+            ls_a.get_connection("Car1").status = "3"
+            await a.persist("ADMIN", {"connections"}, {})
+            ls_a.notes["Car2"] = "from A"
+            await a.persist("ADMIN", {"notes"}, {})
+            return ls_a
+
+        ls_a = asyncio.run(run())
+        self.assertEqual(self._stored("notes")["notes"], {"Car1": "from B", "Car2": "from A"})
+        self.assertEqual(ls_a.notes["Car1"], "from B")
+
+    def test_remote_uncheck_rewinds_checklist(self):
+        async def run():
+            a, b = await self._setup()
+            ls_a, ls_b = a.leitstellen["ADMIN"], b.leitstellen["ADMIN"]
+            ls_a.active_scenarios["Car1"] = {"generated_entries": [
+                {"key": "0-0-0", "actor": "LS"}, {"key": "0-0-1", "actor": "SF"},
+            ]}
+
+            await a.persist("ADMIN", {"meta", "active_scenarios"}, {})
+            await b._apply_remote("ADMIN", {"fields": ["meta", "active_scenarios"]})
+
+            async def set_checked(checked):
+                old = ls_a.checklist_states.get("Car1", ChecklistState()).checked_entries
+                a.update_checklist("ADMIN", "Car1", old, checked)
+                ls_a.checklist_states["Car1"] = ChecklistState(checked_entries=checked)
+                ls_a.bump("Car1")
+                await a.persist("ADMIN", {"meta", "checklist_states"}, {})
+                await b._apply_remote("ADMIN", {"fields": ["meta", "checklist_states"]})
+
+            await set_checked({"0-0-0": True})
+            self.assertEqual(b._compute_next_todo("ADMIN", ls_b, "Car1"), "SF")
+            await set_checked({"0-0-0": False})
+            self.assertEqual(a._compute_next_todo("ADMIN", ls_a, "Car1"), "LS")
+            self.assertEqual(b._compute_next_todo("ADMIN", ls_b, "Car1"), "LS")
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,12 +3,15 @@ from fastapi.testclient import TestClient
 import sys
 import os
 import time
+import json
 import asyncio
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
 
 from main import app
+import manager as manager_module
 from manager import manager
+from models import Connection, LeitstelleData
 
 
 class TestHeartbeat(unittest.TestCase):
@@ -50,6 +53,88 @@ class TestHeartbeat(unittest.TestCase):
         self.client.get(f"/api/poll/{vehicle_code}", params={"name": "Car1"})
         self.assertGreater(conn.last_update, initial_update)
 
+    def test_heartbeat_endpoint_only_touches_liveness(self):
+        resp = self.client.post("/leitstelle", json={"name": "Test"})
+        admin_code = resp.json()["admin_code"]
+        vehicle_code = resp.json()["vehicle_code"]
+
+        first = self.client.post(f"/api/heartbeat/{vehicle_code}", params={"name": "Car1"}).json()
+        self.assertEqual(first["status"], "success")
+        conn = manager.find_connection(manager.leitstellen[admin_code], "Car1")
+        initial_update = conn.last_update
+        payload = manager.status_json(admin_code)[1]
+
+        time.sleep(0.05)
+        again = self.client.post(f"/api/heartbeat/{vehicle_code}", params={"name": "Car1"}).json()
+        self.assertEqual(again["revision"], first["revision"])
+        self.assertGreater(conn.last_update, initial_update)
+        self.assertIs(manager.status_json(admin_code)[1], payload)
+
+    def test_offline_transition_is_pushed(self):
+        resp = self.client.post("/leitstelle", json={"name": "Test"})
+        admin_code = resp.json()["admin_code"]
+        vehicle_code = resp.json()["vehicle_code"]
+        self.client.post(f"/api/heartbeat/{vehicle_code}", params={"name": "Car1"})
+        revision = manager.leitstellen[admin_code].revision
+
+        async def run():
+            queue = manager.subscribe(admin_code)
+            try:
+                await manager.expire_due(time.time() + manager_module.ONLINE_TIMEOUT + 1)
+                return queue.get_nowait()
+            finally:
+                manager.unsubscribe(admin_code, queue)
+
+        self.assertGreater(asyncio.run(run()), revision)
+        car = json.loads(manager.status_json(admin_code)[1])["connections"][0]
+        self.assertFalse(car["is_online"])
+
+        # The next heartbeat brings it back
+        self.client.post(f"/api/heartbeat/{vehicle_code}", params={"name": "Car1"})
+        car = json.loads(manager.status_json(admin_code)[1])["connections"][0]
+        self.assertTrue(car["is_online"])
+
+
+class TestExpiryQueue(unittest.TestCase):
+    def setUp(self):
+        self.manager = manager_module.ConnectionManager()
+        self.ls = LeitstelleData(name="Expiry", vehicle_code="CAR", staffelfuehrer_code="SF")
+        self.manager.register("ADMIN", self.ls)
+        self.now = time.time()
+        for name in ("Car1", "Car2"):
+            self.manager.add_connection("ADMIN", Connection(
+                name=name, last_update=self.now, last_status_update=self.now, last_activity=self.now,
+            ))
+
+    def test_only_due_connections_are_handled(self):
+        later = self.now + manager_module.ONLINE_TIMEOUT + 1
+        # Car2 kept sending heartbeats
+        self.ls.get_connection("Car2").last_update = later - 1
+
+        asyncio.run(self.manager.expire_due(later))
+        self.assertEqual(self.manager._offline["ADMIN"], {"Car1"})
+        # Car1 is rescheduled for cleanup, Car2 for its next online deadline
+        self.assertEqual(len(self.manager._expiry), 2)
+        self.assertEqual(self.manager._expiry.pop_due(later), [])
+
+    def test_silent_connection_is_removed(self):
+        asyncio.run(self.manager.expire_due(self.now + manager_module.CLEANUP_TIMEOUT + 1))
+        self.assertEqual(self.ls.connections, [])
+        self.assertEqual(len(self.manager._expiry), 0)
+
+    def test_restored_stale_vehicle_is_offline(self):
+        manager = manager_module.ConnectionManager()
+        ls = LeitstelleData(name="Restore", vehicle_code="CAR", staffelfuehrer_code="SF")
+        seen = self.now - 100
+        ls.add_connection(Connection(name="Car1", last_update=seen, last_status_update=seen, last_activity=seen))
+        revision = ls.revision
+        manager.register("ADMIN", ls)
+
+        self.assertTrue(manager.is_offline("ADMIN", "Car1"))
+        self.assertGreater(ls.revision, revision)
+        self.assertFalse(json.loads(manager.status_json("ADMIN")[1])["connections"][0]["is_online"])
+        self.assertEqual(manager._expiry.next_deadline(), seen + manager_module.CLEANUP_TIMEOUT)
+
 
 if __name__ == "__main__":
     unittest.main()
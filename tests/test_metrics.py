@@ -0,0 +1,75 @@
+import unittest
+import asyncio
+import sys
+import os
+import time
+
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from main import app
+from manager import ConnectionManager, PERSIST_FIELDS
+from models import Connection, LeitstelleData, ROLE_SF
+import metrics
+from fake_redis import FakeRedis
+
+
+class TestHistogram(unittest.TestCase):
+    def test_buckets_are_cumulative(self):
+        h = metrics.Histogram("test_seconds", "Test", (0.1, 1.0), ("route",))
+        metrics._registry.remove(h)
+        for value in (0.05, 0.5, 5):
+            h.observe(value, "/a")
+        lines = h.render()
+        self.assertIn('test_seconds_bucket{route="/a",le="0.1"} 1', lines)
+        self.assertIn('test_seconds_bucket{route="/a",le="1.0"} 2', lines)
+        self.assertIn('test_seconds_bucket{route="/a",le="+Inf"} 3', lines)
+        self.assertIn('test_seconds_count{route="/a"} 3', lines)
+
+
+class TestMetricsEndpoint(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(app)
+
+    def test_scrape_reports_polls_and_clients(self):
+        resp = self.client.post("/leitstelle", json={"name": "Metrics"})
+        admin_code = resp.json()["admin_code"]
+        vehicle_code = resp.json()["vehicle_code"]
+        self.client.get(f"/api/poll/{vehicle_code}", params={"name": "Car1"})
+        self.client.get(f"/api/poll/{admin_code}")
+
+        resp = self.client.get("/metrics")
+        self.assertTrue(resp.headers["content-type"].startswith("text/plain"))
+        lines = resp.text.splitlines()
+        self.assertIn(f'status_sim_polls_total{{leitstelle="{metrics.leitstelle_id(admin_code)}"}} 2', lines)
+        self.assertNotIn(f'"{admin_code}"', resp.text)
+        self.assertTrue(any(l.startswith('status_sim_http_request_duration_seconds_count'
+                                         '{method="GET",route="/api/poll/{code}"}') for l in lines))
+        self.assertTrue(any(l.startswith('status_sim_status_payload_bytes_count{type="status_update"}')
+                            for l in lines))
+        self.assertIn('status_sim_persist_failures_total 0', lines)
+
+    def test_persist_records_bytes(self):
+        worker = ConnectionManager()
+        worker._redis = FakeRedis()
+        worker.register("ADMIN", LeitstelleData(name="Metrics", vehicle_code="CAR", staffelfuehrer_code="SF"))
+        before = metrics.PERSIST_BYTES._series[()][-1]
+        self.assertTrue(asyncio.run(worker.persist("ADMIN", set(PERSIST_FIELDS), {})))
+        self.assertGreater(metrics.PERSIST_BYTES._series[()][-1], before)
+
+    def test_timed_out_operators_count_as_offline(self):
+        worker = ConnectionManager()
+        ls = LeitstelleData(name="Metrics", vehicle_code="CAR", staffelfuehrer_code="SF")
+        now = time.time()
+        for name, seen in (("SF1", now), ("SF2", now - 100)):
+            ls.add_connection(Connection(name=name, last_update=seen, last_status_update=seen, last_activity=seen,
+                                         is_staffelfuehrer=True))
+        worker.register("ADMIN", ls)
+        asyncio.run(worker.collect_metrics())
+        self.assertEqual(metrics.CLIENTS._series[(ROLE_SF, "online")], 1)
+        self.assertEqual(metrics.CLIENTS._series[(ROLE_SF, "offline")], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import unittest
+import asyncio
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from manager import ConnectionManager
+from models import LeitstelleData, Connection, ChatMessage
+from fake_redis import FakeRedis
+
+
+class TestMultiWorker(unittest.TestCase):
+    """Two managers sharing one Redis behave like two uvicorn workers."""
+
+    def _worker(self, redis):
+        worker = ConnectionManager()
+        worker._redis = redis
+        return worker
+
+    async def _setup(self):
+        redis = FakeRedis()
+        a, b = self._worker(redis), self._worker(redis)
+        ls = LeitstelleData(name="Sync", vehicle_code="CAR", staffelfuehrer_code="SF")
+        now = time.time()
+        ls.add_connection(Connection(name="Car1", last_update=now, last_status_update=now, last_activity=now))
+        a.register("ADMIN", ls)
+        await a.commit("ADMIN")
+        await a.flush()
+        self.assertEqual(await b.ensure_loaded("CAR"), "ADMIN")
+        await a.enable_sync()
+        await b.enable_sync()
+        await asyncio.sleep(0)
+        return a, b
+
+    async def _settle(self):
+        for _ in range(5):
+            await asyncio.sleep(0)
+
+    def test_mutation_is_applied_and_pushed_on_other_worker(self):
+        async def run():
+            a, b = await self._setup()
+            queue = b.subscribe("ADMIN")
+
+            ls_a = a.leitstellen["ADMIN"]
+            ls_a.get_connection("Car1").status = "1"
+            ls_a.notes["Car1"] = "Notiz"
+            ls_a.bump("Car1")
+            await a.commit("ADMIN", "connections", "notes")
+            await self._settle()
+
+            ls_b = b.leitstellen["ADMIN"]
+            self.assertEqual(ls_b.get_connection("Car1").status, "1")
+            self.assertEqual(ls_b.notes["Car1"], "Notiz")
+            self.assertGreater(ls_b.vehicle_revisions["Car1"], 0)
+            self.assertEqual(ls_b.revision, ls_b.vehicle_revisions["Car1"])
+            self.assertFalse(queue.empty())
+            await a.close()
+            await b.close()
+
+        asyncio.run(run())
+
+    def test_chat_and_heartbeats_reach_other_worker(self):
+        async def run():
+            a, b = await self._setup()
+            ls_a = a.leitstellen["ADMIN"]
+
+            ls_a.bump()
+            await a.append_chat("ADMIN", "Car1", ChatMessage(sender="LS", text="Hallo", timestamp=1, revision=ls_a.revision))
+            await a.commit("ADMIN", "meta")
+            conn = ls_a.get_connection("Car1")
+            conn.last_update = time.time() + 5
+            a.note_heartbeat("ADMIN", conn)
+            await a.flush()
+            await self._settle()
+
+            ls_b = b.leitstellen["ADMIN"]
+            self.assertEqual([m.text for m in ls_b.chat_history["Car1"]], ["Hallo"])
+            self.assertEqual(ls_b.get_connection("Car1").last_update, conn.last_update)
+            # The own worker ignores its events
+            self.assertEqual(len(ls_a.chat_history["Car1"]), 1)
+            await a.close()
+            await b.close()
+
+        asyncio.run(run())
+
+    def test_concurrent_chat_gets_unique_seqs(self):
+        async def run():
+            a, b = await self._setup()
+            ls_a, ls_b = a.leitstellen["ADMIN"], b.leitstellen["ADMIN"]
+            cursor = ls_b.chat_seq
+
+            async def send(worker, ls, text):
+                ls.bump()
+                await worker.append_chat("ADMIN", "Car1", ChatMessage(
+                    sender="LS", text=text, timestamp=1, revision=ls.revision))
+                await worker.commit("ADMIN", "meta")
+
+            await asyncio.gather(send(a, ls_a, "A"), send(b, ls_b, "B"))
+            await self._settle()
+
+            for ls in (ls_a, ls_b):
+                seqs = [m.seq for m in ls.chat_history["Car1"]]
+                self.assertEqual(len(set(seqs)), 2)
+                self.assertEqual(seqs, sorted(seqs))
+                self.assertEqual({m.text for m in ls.chat_after("Car1", cursor)}, {"A", "B"})
+            await a.close()
+            await b.close()
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,227 @@
+import unittest
+import asyncio
+import json
+import time
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from manager import ConnectionManager
+from models import LeitstelleData, Connection, ChatMessage, CHAT_HISTORY_LIMIT
+from fake_redis import FakeRedis
+
+
+def _leitstelle():
+    ls = LeitstelleData(name="Persist", vehicle_code="CAR", staffelfuehrer_code="SF")
+    ls.add_connection(Connection(name="Car1", last_update=1, last_status_update=1, last_activity=1))
+    return ls
+
+
+class TestWriteBehind(unittest.TestCase):
+    def setUp(self):
+        self.manager = ConnectionManager()
+        self.redis = FakeRedis()
+        self.manager._redis = self.redis
+        self.manager.leitstellen["ADMIN"] = _leitstelle()
+
+    def _writes(self):
+        return [c for c in self.redis.commands if c[:2] == ("hset", "ls:ADMIN")]
+
+    def test_burst_of_commits_is_one_write(self):
+        async def run():
+            for _ in range(10):
+                await self.manager.commit("ADMIN", "connections")
+            self.assertEqual(self._writes(), [])
+            await self.manager.flush()
+            await self.manager.flush()
+
+        asyncio.run(run())
+        self.assertEqual(self._writes(), [("hset", "ls:ADMIN", ("connections", "meta", "version"))])
+
+    def test_zero_interval_writes_through(self):
+        self.manager.persist_interval_ms = 0
+
+        async def run():
+            await self.manager.commit("ADMIN", "notes")
+            await self.manager.commit("ADMIN", "notes")
+
+        asyncio.run(run())
+        self.assertEqual(len(self._writes()), 2)
+
+    def test_close_flushes_pending_writes(self):
+        async def run():
+            await self.manager.commit("ADMIN")
+            await self.manager.close()
+
+        asyncio.run(run())
+        self.assertEqual(len(self._writes()), 1)
+
+
+class TestSplitPersistence(unittest.TestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+
+    def _manager(self):
+        manager = ConnectionManager()
+        manager._redis = self.redis
+        return manager
+
+    def test_roundtrip_with_capped_chat(self):
+        manager = self._manager()
+        ls = _leitstelle()
+        ls.notes["Car1"] = "Notiz"
+        manager.leitstellen["ADMIN"] = ls
+
+        async def run():
+            await manager.commit("ADMIN")
+            await manager.flush()
+            for i in range(CHAT_HISTORY_LIMIT + 5):
+                await manager.append_chat("ADMIN", "Car1", ChatMessage(sender="LS", text=str(i), timestamp=i))
+            await manager.commit("ADMIN", "meta")
+            await manager.flush()
+
+            restored = self._manager()
+            await restored._load_all()
+            return restored
+
+        restored = asyncio.run(run())
+        self.assertEqual(len(self.redis.data["chat:ADMIN:Car1"]), CHAT_HISTORY_LIMIT)
+        ls = restored.leitstellen["ADMIN"]
+        self.assertEqual(restored.code_to_admin["CAR"], "ADMIN")
+        self.assertEqual(ls.notes, {"Car1": "Notiz"})
+        self.assertIsNotNone(ls.get_connection("Car1"))
+        self.assertEqual(ls.chat_history["Car1"][-1].text, str(CHAT_HISTORY_LIMIT + 4))
+        self.assertEqual(len(ls.chat_history["Car1"]), CHAT_HISTORY_LIMIT)
+
+    def test_configured_chat_cap_and_archive(self):
+        manager = self._manager()
+        manager.chat_history_limit = 5
+        manager.chat_archive_maxlen = 8
+        manager.register("ADMIN", _leitstelle())
+
+        async def run():
+            for i in range(12):
+                await manager.append_chat("ADMIN", "Car1", ChatMessage(sender="LS", text=str(i), timestamp=i))
+            await manager.commit("ADMIN", "meta")
+            await manager.flush()
+
+        asyncio.run(run())
+        history = manager.leitstellen["ADMIN"].chat_history["Car1"]
+        self.assertEqual([m.text for m in history], ["7", "8", "9", "10", "11"])
+        self.assertEqual(len(self.redis.data["chat:ADMIN:Car1"]), 5)
+        archive = self.redis.data["chat_archive:ADMIN"]
+        self.assertEqual(len(archive), 8)
+        self.assertEqual(json.loads(archive[-1]["message"])["text"], "11")
+
+    def test_note_change_writes_only_its_field(self):
+        manager = self._manager()
+        manager.leitstellen["ADMIN"] = _leitstelle()
+
+        async def run():
+            await manager.commit("ADMIN", "notes")
+            await manager.flush()
+
+        asyncio.run(run())
+        self.assertEqual(self.redis.commands, [("hset", "ls:ADMIN", ("meta", "notes", "version"))])
+
+    def test_restore_registers_codes_and_index(self):
+        manager = self._manager()
+        for i in range(3):
+            ls = LeitstelleData(name=f"LS{i}", vehicle_code=f"CAR{i}", staffelfuehrer_code=f"SF{i}")
+            manager.leitstellen[f"ADMIN{i}"] = ls
+
+        async def run():
+            for i in range(3):
+                await manager.commit(f"ADMIN{i}")
+            await manager.flush()
+            del self.redis.data["ls_codes"]
+            restored = self._manager()
+            await restored._load_all()
+            return restored
+
+        restored = asyncio.run(run())
+        self.assertEqual(sorted(restored.leitstellen), ["ADMIN0", "ADMIN1", "ADMIN2"])
+        self.assertEqual(restored.resolve_admin_code("sf2"), "ADMIN2")
+        self.assertEqual(self.redis.data["ls_codes"]["CAR1"], "ADMIN1")
+
+    def test_lazy_load_faults_in_on_first_access(self):
+        manager = self._manager()
+        manager.leitstellen["ADMIN"] = _leitstelle()
+        asyncio.run(manager.commit("ADMIN"))
+        asyncio.run(manager.flush())
+
+        lazy = self._manager()
+        lazy.lazy_load = True
+        self.assertIsNone(lazy.resolve_admin_code("CAR"))
+        self.assertEqual(asyncio.run(lazy.ensure_loaded("car")), "ADMIN")
+        self.assertIsNotNone(lazy.leitstellen["ADMIN"].get_connection("Car1"))
+        self.assertIsNone(asyncio.run(lazy.ensure_loaded("UNKNOWN")))
+
+    def test_legacy_single_key_is_migrated(self):
+        ls = _leitstelle()
+        ls.append_chat("Car1", ChatMessage(sender="LS", text="Alt", timestamp=1))
+        self.redis.data["ls:ADMIN"] = ls.model_dump_json()
+
+        manager = self._manager()
+        asyncio.run(manager._load_all())
+
+        self.assertEqual(manager.leitstellen["ADMIN"].chat_history["Car1"][0].text, "Alt")
+        stored = self.redis.data["ls:ADMIN"]
+        self.assertIsInstance(stored, dict)
+        self.assertEqual(json.loads(stored["connections"])["connections"][0]["name"], "Car1")
+        self.assertEqual(len(self.redis.data["chat:ADMIN:Car1"]), 1)
+
+
+class TestEviction(unittest.TestCase):
+    def setUp(self):
+        self.manager = ConnectionManager()
+        self.manager._redis = FakeRedis()
+        for i in range(3):
+            self.manager.register(f"ADMIN{i}", LeitstelleData(
+                name=f"LS{i}", vehicle_code=f"CAR{i}", staffelfuehrer_code=f"SF{i}",
+            ))
+            asyncio.run(self.manager.commit(f"ADMIN{i}"))
+
+    def test_lru_entries_are_evicted_and_faulted_back_in(self):
+        self.manager.max_in_memory = 2
+        self.manager.touch("ADMIN0")
+        asyncio.run(self.manager.evict_idle())
+
+        self.assertEqual(sorted(self.manager.leitstellen), ["ADMIN0", "ADMIN2"])
+        self.assertIsNone(self.manager.resolve_admin_code("CAR1"))
+        # The pending write was flushed before eviction
+        self.assertEqual(asyncio.run(self.manager.ensure_loaded("car1")), "ADMIN1")
+        self.assertEqual(self.manager.leitstellen["ADMIN1"].name, "LS1")
+
+    def test_idle_and_in_use_entries(self):
+        self.manager.idle_evict_seconds = 0
+        ls = self.manager.leitstellen["ADMIN1"]
+        ls.add_connection(Connection(name="Car1", last_update=time.time(), last_status_update=1, last_activity=1))
+        self.manager.subscribers["ADMIN2"] = {object()}
+        asyncio.run(self.manager.evict_idle())
+        self.assertEqual(sorted(self.manager.leitstellen), ["ADMIN1", "ADMIN2"])
+
+    def test_entry_touched_during_flush_is_kept(self):
+        self.manager.idle_evict_seconds = 0
+        persist = self.manager.persist
+
+        async def touching_persist(admin_code, fields, chat):
+            # A request arrives while the final write is in flight
+            self.manager.touch(admin_code)
+            return await persist(admin_code, fields, chat)
+        self.manager.persist = touching_persist
+
+        asyncio.run(self.manager.evict_idle())
+        self.assertEqual(len(self.manager.leitstellen), 3)
+        self.assertFalse(self.manager._dirty)
+
+    def test_no_eviction_without_redis(self):
+        self.manager._redis = None
+        self.manager.max_in_memory = 0
+        asyncio.run(self.manager.evict_idle())
+        self.assertEqual(len(self.manager.leitstellen), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
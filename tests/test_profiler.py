@@ -0,0 +1,90 @@
+import unittest
+import asyncio
+import sys
+import os
+import time
+
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from main import app
+from profiler import LoopLagMonitor, LoopWatchdog, profiler
+import metrics
+
+
+def busy_handler(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+class TestProfiler(unittest.TestCase):
+    def test_blocking_call_shows_in_stacks_and_lag(self):
+        async def run():
+            async def block():
+                await asyncio.sleep(0.02)
+                busy_handler(0.15)
+            task = asyncio.create_task(block())
+            result = await profiler.profile(0.3, interval=0.002)
+            await task
+            return result
+
+        result = asyncio.run(run())
+        self.assertGreater(result["samples"], 0)
+        self.assertIn("busy_handler (test_profiler.py:", result["collapsed"])
+        self.assertGreater(result["lag"]["max"], 0.05)
+
+    def test_lag_summary(self):
+        monitor = LoopLagMonitor(maxlen=3)
+        for lag in (0.5, 0.1, 0.2, 0.3):
+            monitor.record(lag)
+        summary = monitor.summary()
+        self.assertEqual(summary["samples"], 3)
+        self.assertEqual(summary["max"], 0.3)
+
+
+class TestWatchdog(unittest.TestCase):
+    def test_stall_is_recorded_with_stack(self):
+        watchdog = LoopWatchdog(threshold=0.05, interval=0.01)
+        stalls_before = metrics.EVENT_LOOP_STALLS._series[()]
+
+        async def run():
+            task = asyncio.create_task(watchdog.run())
+            await asyncio.sleep(0.05)
+            busy_handler(0.2)
+            await asyncio.sleep(0.05)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        with self.assertLogs("src.profiler", level="WARNING"):
+            asyncio.run(run())
+        self.assertEqual(len(watchdog.stalls), 1)
+        self.assertGreater(watchdog.stalls[0]["lag"], 0.1)
+        self.assertIn("busy_handler", watchdog.stalls[0]["stack"])
+        self.assertEqual(metrics.EVENT_LOOP_STALLS._series[()], stalls_before + 1)
+
+
+class TestProfileEndpoint(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        profiler.token = None
+
+    def test_disabled_without_token(self):
+        self.assertEqual(self.client.get("/api/debug/profile", params={"seconds": 0}).status_code, 404)
+        profiler.token = "secret"
+        self.assertEqual(self.client.get("/api/debug/profile", params={"seconds": 0, "token": "x"}).status_code, 404)
+
+    def test_collapsed_output(self):
+        profiler.token = "secret"
+        resp = self.client.get("/api/debug/profile", params={"seconds": 0.05, "token": "secret", "format": "collapsed"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.headers["content-type"].startswith("text/plain"))
+        for line in resp.text.splitlines():
+            self.assertRegex(line, r" \d+$")
+
+
+if __name__ == "__main__":
+    unittest.main()
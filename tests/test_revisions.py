@@ -0,0 +1,139 @@
+import unittest
+from fastapi.testclient import TestClient
+import sys
+import os
+import json
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from main import app
+from manager import manager
+from models import BROADCAST_CHANNEL
+
+
+class TestRevisions(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(app)
+
+    def _create(self):
+        resp = self.client.post("/leitstelle", json={"name": "Rev Test"})
+        d = resp.json()
+        return d["admin_code"], d["vehicle_code"], d["staffelfuehrer_code"]
+
+    def _poll(self, code, name=None, since=None):
+        params = {}
+        if name:
+            params["name"] = name
+        if since is not None:
+            params["since"] = since
+        return self.client.get(f"/api/poll/{code}", params=params).json()
+
+    def test_unchanged_when_nothing_happened(self):
+        admin_code, vehicle_code, _ = self._create()
+        self._poll(vehicle_code, "Car1")
+
+        full = self._poll(admin_code)
+        data = self._poll(admin_code, since=full["revision"])
+        self.assertEqual(data, {"type": "unchanged", "revision": full["revision"]})
+
+    def test_delta_contains_only_changed_vehicles(self):
+        admin_code, vehicle_code, _ = self._create()
+        self._poll(vehicle_code, "Car1")
+        self._poll(vehicle_code, "Car2")
+
+        full = self._poll(admin_code)
+        self.client.post(f"/api/vehicle/{vehicle_code}/action", json={
+            "name": "Car2", "action": "status", "value": "1",
+        })
+
+        data = self._poll(admin_code, since=full["revision"])
+        self.assertEqual(data["type"], "status_delta")
+        self.assertGreater(data["revision"], full["revision"])
+        self.assertEqual([c["name"] for c in data["connections"]], ["Car2"])
+        self.assertEqual(data["connections"][0]["status"], "1")
+        self.assertEqual(sorted(data["names"]), ["Car1", "Car2"])
+        self.assertIsNone(data["notices"])
+
+    def test_delta_messages_and_notices(self):
+        admin_code, vehicle_code, sf_code = self._create()
+        self._poll(vehicle_code, "Car1")
+        self._poll(sf_code, "SF1")
+        self.client.post(f"/api/leitstelle/{admin_code}/message", json={"message": "Alt", "target_name": "Car1"})
+
+        full = self._poll(vehicle_code, "Car1")
+        self.assertEqual([m["text"] for m in full["messages"]], ["Alt"])
+
+        self.client.post(f"/api/leitstelle/{admin_code}/message", json={"message": "Neu", "target_name": "Car1"})
+        self.client.post(f"/api/staffelfuehrer/{sf_code}/claim", json={"target_name": "Car1", "sf_name": "SF1"})
+        self.client.post(f"/api/staffelfuehrer/{sf_code}/notice", json={
+            "target_name": "Car1", "text": "Anfordern", "sf_name": "SF1",
+        })
+
+        data = self._poll(vehicle_code, "Car1", since=full["revision"])
+        self.assertEqual([m["text"] for m in data["messages"]], ["Neu"])
+        self.assertEqual(data["notices"]["Car1"]["status"], "pending")
+
+    def test_chat_after_cursor(self):
+        admin_code, vehicle_code, _ = self._create()
+        self._poll(vehicle_code, "Car1")
+        for text in ("Eins", "Zwei"):
+            self.client.post(f"/api/leitstelle/{admin_code}/message", json={"message": text, "target_name": "Car1"})
+
+        full = self._poll(vehicle_code, "Car1")
+        self.assertEqual([m["seq"] for m in full["messages"]], [1, 2])
+        self.client.post(f"/api/leitstelle/{admin_code}/message", json={"message": "Drei", "target_name": "Car1"})
+
+        data = self.client.get(f"/api/poll/{vehicle_code}", params={"name": "Car1", "after": 2}).json()
+        self.assertEqual(data["type"], "status_update")
+        self.assertEqual([m["text"] for m in data["messages"]], ["Drei"])
+        self.assertEqual(data["messages_after"], 2)
+
+        history = self.client.get(f"/api/leitstelle/{admin_code}/chat_history",
+                                  params={"target_name": "Car1", "after": 1}).json()
+        self.assertEqual([m["text"] for m in history["messages"]], ["Zwei", "Drei"])
+
+    def test_broadcast_is_stored_once_and_merged(self):
+        admin_code, vehicle_code, _ = self._create()
+        self._poll(vehicle_code, "Car1")
+        self._poll(vehicle_code, "Car2")
+        self.client.post(f"/api/leitstelle/{admin_code}/message", json={"message": "Privat", "target_name": "Car1"})
+        self.client.post(f"/api/leitstelle/{admin_code}/message", json={"message": "An alle"})
+
+        ls = manager.leitstellen[admin_code]
+        self.assertNotIn("Car2", ls.chat_history)
+        self.assertEqual(len(ls.chat_history[BROADCAST_CHANNEL]), 1)
+        car1 = self._poll(vehicle_code, "Car1")
+        self.assertEqual([m["text"] for m in car1["messages"]], ["Privat", "An alle"])
+        car2 = self._poll(vehicle_code, "Car2")
+        self.assertEqual([m["text"] for m in car2["messages"]], ["An alle"])
+
+    def test_status_json_cached_until_mutation(self):
+        admin_code, vehicle_code, _ = self._create()
+        self._poll(vehicle_code, "Car1")
+
+        first = manager.status_json(admin_code)[1]
+        self.assertIs(manager.status_json(admin_code)[1], first)
+
+        self.client.post(f"/api/leitstelle/{admin_code}/update_note", json={
+            "target_name": "Car1", "note": "Neu",
+        })
+        second = manager.status_json(admin_code)[1]
+        self.assertIsNot(second, first)
+        self.assertEqual(json.loads(second)["connections"][0]["note"], "Neu")
+
+    def test_pollers_share_serialized_status(self):
+        admin_code, _, _ = self._create()
+        first = self.client.get(f"/api/poll/{admin_code}")
+        self.assertEqual(first.headers["content-type"], "application/json")
+        self.assertIs(manager.status_json(admin_code)[1], manager.status_json(admin_code)[1])
+        self.assertEqual(self.client.get(f"/api/poll/{admin_code}").content, first.content)
+        self.assertEqual(first.content, manager.status_json(admin_code)[1])
+
+    def test_future_revision_returns_full_update(self):
+        admin_code, _, _ = self._create()
+        data = self._poll(admin_code, since=10_000)
+        self.assertEqual(data["type"], "status_update")
+
+
+if __name__ == "__main__":
+    unittest.main()
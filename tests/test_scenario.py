@@ -6,6 +6,8 @@ import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
 
 from main import app
+from scenario_catalog import catalog
+from scenario_models import FunkEntry, index_checklist_entries
 
 
 class TestScenario(unittest.TestCase):
@@ -52,6 +54,62 @@ class TestScenario(unittest.TestCase):
         car1 = next(c for c in data["connections"] if c["name"] == "Car1")
         self.assertIsNone(car1["active_scenario"])
 
+    def test_next_todo_follows_checklist(self):
+        resp = self.client.post("/leitstelle", json={"name": "TodoTest"})
+        admin_code = resp.json()["admin_code"]
+        vehicle_code = resp.json()["vehicle_code"]
+        self.client.get(f"/api/poll/{vehicle_code}", params={"name": "Car1"})
+
+        scenario_name = self.client.get(f"/api/leitstelle/{admin_code}/scenarios").json()["scenarios"][0]["name"]
+        self.client.post(f"/api/leitstelle/{admin_code}/scenario/start", json={
+            "target_name": "Car1", "scenario_name": scenario_name,
+        })
+
+        def car1():
+            data = self.client.get(f"/api/poll/{admin_code}").json()
+            return next(c for c in data["connections"] if c["name"] == "Car1")
+
+        entries = car1()["active_scenario"]["generated_entries"]
+        self.assertEqual(entries[0]["key"], "0-0-0")
+        self.assertEqual(entries[0]["actor"], "LS")
+        self.assertEqual(car1()["next_todo"], "LS")
+
+        def update(checked):
+            self.client.post(f"/api/leitstelle/{admin_code}/scenario/update_state", json={
+                "target_name": "Car1",
+                "state": {"expanded_einsaetze": {}, "expanded_schritte": {}, "checked_entries": checked},
+            })
+
+        # Second entry is the vehicle's answer, which is not an LS/SF todo
+        update({"0-0-0": True})
+        self.assertEqual(entries[1]["actor"], "FZ")
+        self.assertIsNone(car1()["next_todo"])
+
+        update({"0-0-0": True, "0-0-1": True})
+        self.assertEqual(car1()["next_todo"], entries[2]["actor"])
+
+        # Unchecking an earlier entry moves the todo back
+        update({"0-0-1": True})
+        self.assertEqual(car1()["next_todo"], "LS")
+
+    def test_legacy_entries_get_indexed(self):
+        entries = [
+            {"actor": "LS", "message": "[[E0]][[S0]]A"},
+            {"actor": "FZ", "message": "[[E0]][[S0]]B"},
+            {"actor": "LS", "message": "[[E0]][[S1]]C"},
+            {"actor": "FZ", "message": "[[E1]][[S10]]D"},
+        ]
+        index_checklist_entries(entries)
+        self.assertEqual([e["key"] for e in entries], ["0-0-0", "0-0-1", "0-1-0", "1-10-0"])
+        self.assertEqual((entries[3]["einsatz"], entries[3]["schritt"], entries[3]["index"]), (1, 10, 0))
+
+    def test_every_scenario_generates_entries(self):
+        for entry in catalog.entries():
+            if entry.scenario:
+                with self.subTest(scenario=entry.name):
+                    entries = entry.scenario.generate_funksprueche(fk="Car1", ls="LS", start_enr=1)
+                    self.assertTrue(all(isinstance(e, FunkEntry) and e.key for e in entries))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from scenario_catalog import ScenarioCatalog, SCENARIOS_DIR
+
+
+class TestScenarioCatalog(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.catalog = ScenarioCatalog(self.tmp.name)
+        with open(os.path.join(SCENARIOS_DIR, "scenario_11_rd_sturz.json"), encoding="utf-8") as f:
+            self.raw = json.load(f)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _write(self, fname, data, mtime):
+        path = os.path.join(self.tmp.name, fname)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.utime(path, (mtime, mtime))
+
+    def test_files_are_parsed_once_and_shared(self):
+        self._write("a.json", self.raw, 1000)
+        first = self.catalog.get(self.raw["name"])
+        self.assertIsNotNone(first.scenario)
+        self.catalog.refresh(force=True)
+        self.assertIs(self.catalog.get(self.raw["name"]), first)
+
+    def test_changed_and_removed_files_are_reloaded(self):
+        self._write("a.json", self.raw, 1000)
+        self.catalog.refresh(force=True)
+
+        self._write("a.json", dict(self.raw, name="Umbenannt"), 2000)
+        self.catalog.refresh(force=True)
+        self.assertEqual(self.catalog.names(), ["Umbenannt"])
+
+        os.remove(os.path.join(self.tmp.name, "a.json"))
+        self.catalog.refresh(force=True)
+        self.assertEqual(self.catalog.names(), [])
+
+    def test_invalid_scenario_is_listed_with_error(self):
+        self._write("broken.json", {"name": "Kaputt", "beschreibung": "x"}, 1000)
+        entry = self.catalog.get("Kaputt")
+        self.assertIsNone(entry.scenario)
+        self.assertIsNotNone(entry.error)
+        self.assertIsNone(self.catalog.random_valid())
+
+    def test_unreadable_file_is_logged_once_per_change(self):
+        path = os.path.join(self.tmp.name, "a.json")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("{")
+        os.utime(path, (1000, 1000))
+        with self.assertLogs("src.scenario_catalog", level="ERROR") as logs:
+            self.catalog.refresh(force=True)
+            self.catalog.refresh(force=True)
+            self._write("a.json", self.raw, 2000)
+            self.catalog.refresh(force=True)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("{")
+            os.utime(path, (3000, 3000))
+            self.catalog.refresh(force=True)
+            self.catalog.refresh(force=True)
+        self.assertEqual(len(logs.records), 2)
+        self.assertEqual(self.catalog.names(), [])
+
+    def test_started_scenarios_do_not_share_data(self):
+        self._write("a.json", self.raw, 1000)
+        entry = self.catalog.get(self.raw["name"])
+        first = entry.dump()
+        first["einsaetze"][0]["schritte"].clear()
+        self.assertTrue(entry.dump()["einsaetze"][0]["schritte"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+import unittest
+import asyncio
+import sys
+import os
+
+from fastapi import WebSocketDisconnect
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from main import app
+from manager import ConnectionManager, PERSIST_FIELDS, manager
+from models import LeitstelleData
+from sharding import HashRing
+from fake_redis import FakeRedis
+
+
+class TestHashRing(unittest.TestCase):
+    def test_adding_a_node_moves_only_its_share(self):
+        keys = [f"CODE{i}" for i in range(1000)]
+        before = HashRing({"a": "", "b": "", "c": ""})
+        after = HashRing({"a": "", "b": "", "c": "", "d": ""})
+        moved = [k for k in keys if before.node_for(k) != after.node_for(k)]
+        self.assertTrue(all(after.node_for(k) == "d" for k in moved))
+        self.assertLess(len(moved), 400)
+
+
+class TestSharding(unittest.TestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+
+    def _worker(self, url):
+        worker = ConnectionManager()
+        worker._redis = self.redis
+        worker.shard_url = url
+        return worker
+
+    def test_workers_split_ownership_and_release_on_join(self):
+        async def run():
+            a = self._worker("http://a:8000")
+            await a._renew_lease()
+            for i in range(20):
+                a.register(f"LS{i}", LeitstelleData(name=str(i), vehicle_code=f"CAR{i}", staffelfuehrer_code=f"SF{i}"))
+                await a.persist(f"LS{i}", set(PERSIST_FIELDS), {})
+            self.assertEqual(len(a.leitstellen), 20)
+
+            b = self._worker("http://b:8000")
+            await b._renew_lease()
+            await a._renew_lease()
+
+            codes = [f"LS{i}" for i in range(20)]
+            self.assertTrue(all(a.owns(c) != b.owns(c) for c in codes))
+            self.assertEqual(sorted(a.leitstellen), sorted(c for c in codes if a.owns(c)))
+
+            moved = next(c for c in codes if b.owns(c))
+            self.assertEqual(await a.owner_url(moved), "http://b:8000")
+            self.assertIsNone(await a.ensure_loaded(moved))
+            self.assertEqual(await b.ensure_loaded(moved.replace("LS", "CAR")), moved)
+            self.assertIsNone(await b.owner_url(moved))
+
+        asyncio.run(run())
+
+    def test_failed_handover_write_keeps_leitstelle(self):
+        async def run():
+            a = self._worker("http://a:8000")
+            await a._renew_lease()
+            for i in range(20):
+                a.register(f"LS{i}", LeitstelleData(name=str(i), vehicle_code=f"CAR{i}", staffelfuehrer_code=f"SF{i}"))
+                await a.persist(f"LS{i}", set(PERSIST_FIELDS), {})
+            b = self._worker("http://b:8000")
+            await b._renew_lease()
+            moved = [c for c in a.leitstellen if b.owns(c)]
+            for code in moved:
+                a.leitstellen[code].notes["Car1"] = "ungespeichert"
+                await a.mark_dirty(code, {"notes"})
+
+            write = a._write
+
+            async def failing_write(*args, **kwargs):
+                raise ConnectionError("redis down")
+            a._write = failing_write
+            await a._renew_lease()
+            self.assertTrue(all(c in a.leitstellen and c in a._dirty for c in moved))
+            self.assertTrue(all(f"ls:{c}" in self.redis.data for c in moved))
+
+            a._write = write
+            await a._renew_lease()
+            self.assertFalse(any(c in a.leitstellen for c in moved))
+            code = moved[0]
+            self.assertEqual(self.redis.data["ls_codes"][code.replace("LS", "CAR")], code)
+            self.assertEqual(await b.ensure_loaded(code), code)
+            self.assertEqual(b.leitstellen[code].notes["Car1"], "ungespeichert")
+
+        asyncio.run(run())
+
+    def test_foreign_code_is_redirected(self):
+        manager._ring = HashRing({"other": "http://other:8000"})
+        try:
+            client = TestClient(app)
+            resp = client.get("/api/poll/ABCD1234", params={"name": "Car1"}, follow_redirects=False)
+            self.assertEqual(resp.status_code, 307)
+            self.assertEqual(resp.headers["location"], "http://other:8000/api/poll/ABCD1234?name=Car1")
+        finally:
+            manager._ring = None
+
+    def test_foreign_websocket_gets_target_before_close(self):
+        manager._ring = HashRing({"other": "http://other:8000"})
+        name = "Car" + "1" * 150
+        try:
+            client = TestClient(app)
+            with client.websocket_connect(f"/ws/ABCD1234?name={name}") as ws:
+                moved = ws.receive_json()
+                with self.assertRaises(WebSocketDisconnect) as closed:
+                    ws.receive_json()
+            self.assertEqual(moved, {"type": "moved", "url": f"http://other:8000/ws/ABCD1234?name={name}"})
+            self.assertEqual(closed.exception.code, 4307)
+        finally:
+            manager._ring = None
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -93,6 +93,24 @@ class TestStaffelfuehrer(unittest.TestCase):
         self.assertEqual(car["note"], "LS Note")
         self.assertEqual(car["sf_note"], "SF Overwrite")
 
+    def test_renamed_sf_keeps_channel_lookup(self):
+        admin_code, vehicle_code, sf_code = self._create()
+        self._poll(vehicle_code, "Car1")
+        self._poll(sf_code, "SF1")
+
+        # Re-registering under a new name replaces the SF
+        self._poll(sf_code, "SF2")
+        resp = self.client.post(f"/api/staffelfuehrer/{sf_code}/channel", json={"name": "SF1", "channel": "K1"})
+        self.assertEqual(resp.json()["status"], "error")
+
+        self.client.post(f"/api/staffelfuehrer/{sf_code}/claim", json={"target_name": "Car1", "sf_name": "SF2"})
+        resp = self.client.post(f"/api/staffelfuehrer/{sf_code}/channel", json={"name": "SF2", "channel": "K1"})
+        self.assertEqual(resp.json()["status"], "success")
+
+        data = self._poll(admin_code)
+        car = next(c for c in data["connections"] if c["name"] == "Car1")
+        self.assertEqual(car["sf_radio_channel"], "K1")
+
 
 if __name__ == "__main__":
     unittest.main()
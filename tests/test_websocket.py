@@ -0,0 +1,65 @@
+import unittest
+from fastapi.testclient import TestClient
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from main import app
+from manager import manager
+
+
+class TestWebSocket(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(app)
+        self.client.__enter__()
+
+    def tearDown(self):
+        self.client.__exit__(None, None, None)
+
+    def _create(self):
+        resp = self.client.post("/leitstelle", json={"name": "WS Test"})
+        d = resp.json()
+        return d["admin_code"], d["vehicle_code"], d["staffelfuehrer_code"]
+
+    def test_initial_state_and_push_on_mutation(self):
+        admin_code, vehicle_code, _ = self._create()
+        self.client.get(f"/api/poll/{vehicle_code}", params={"name": "Car1"})
+
+        with self.client.websocket_connect(f"/ws/{admin_code}") as ws:
+            data = ws.receive_json()
+            self.assertEqual(data["type"], "status_update")
+            car1 = next(c for c in data["connections"] if c["name"] == "Car1")
+            self.assertEqual(car1["status"], "2")
+
+            self.client.post(f"/api/vehicle/{vehicle_code}/action", json={
+                "name": "Car1", "action": "status", "value": "1",
+            })
+            data = ws.receive_json()
+            car1 = next(c for c in data["connections"] if c["name"] == "Car1")
+            self.assertEqual(car1["status"], "1")
+
+        self.assertNotIn(admin_code, manager.subscribers)
+
+    def test_vehicle_socket_registers_and_receives_messages(self):
+        admin_code, vehicle_code, _ = self._create()
+
+        with self.client.websocket_connect(f"/ws/{vehicle_code}?name=Car1") as ws:
+            data = ws.receive_json()
+            self.assertTrue(any(c["name"] == "Car1" for c in data["connections"]))
+            self.assertEqual(data["messages"], [])
+
+            self.client.post(f"/api/leitstelle/{admin_code}/message", json={
+                "message": "Hallo", "target_name": "Car1",
+            })
+            data = ws.receive_json()
+            self.assertTrue(any(m["text"] == "Hallo" for m in data["messages"]))
+
+    def test_invalid_code_is_rejected(self):
+        with self.assertRaises(Exception):
+            with self.client.websocket_connect("/ws/NONEXISTENT") as ws:
+                ws.receive_json()
+
+
+if __name__ == "__main__":
+    unittest.main()